@@ -1,45 +1,47 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from schemas import AddressCreate, AddressOut
-from database import get_db
-from auth import get_current_user
-import crud, models
+from database import get_async_db
+from principals import async_current_user
+import async_crud, models
 
 
 router = APIRouter(prefix="/addresses", tags=["Addresses"])
 
 
 @router.post("/", response_model=AddressOut)
-def add_address(
+async def add_address(
     data: AddressCreate,
-    db: Session = Depends(get_db),
-    user: models.User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    user: models.User = Depends(async_current_user)
 ):
-    return crud.create_address(db, user.id, data)
+    return await async_crud.create_address(db, user.id, data)
 
 
 @router.get("/", response_model=list[AddressOut])
-def get_addresses(
-    db: Session = Depends(get_db),
-    user: models.User = Depends(get_current_user)
+async def get_addresses(
+    db: AsyncSession = Depends(get_async_db),
+    user: models.User = Depends(async_current_user)
 ):
-    return crud.list_addresses(db, user.id)
+    return await async_crud.list_addresses(db, user.id)
 
 
 @router.put("/{address_id}/primary", response_model=AddressOut)
-def make_primary(
+async def make_primary(
     address_id: int,
-    db: Session = Depends(get_db),
-    user: models.User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    user: models.User = Depends(async_current_user)
 ):
-    addr = crud.set_primary_address(db, user.id, address_id)
+    addr = await async_crud.set_primary_address(db, user.id, address_id)
     if not addr:
         raise HTTPException(404, "Address not found")
     return addr
 
 @router.delete("/{address_id}")
-def delete_address(address_id: int, db: Session = Depends(get_db), user=Depends(get_current_user)):
-    success = crud.delete_address(db, user.id, address_id)
+async def delete_address(
+    address_id: int, db: AsyncSession = Depends(get_async_db), user=Depends(async_current_user)
+):
+    success = await async_crud.delete_address(db, user.id, address_id)
     if not success:
         raise HTTPException(404, "Address not found")
     return {"message": "Address deleted"}
@@ -1,70 +1,156 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-import auth
-from database import get_db
+from typing import Literal
+from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, selectinload
+from database import get_async_db, get_db
 import models
-from auth import require_admin
+import schemas
+import async_crud
+import catalog_import
+import exports
+import hashing
+import jobs
+from pagination import MAX_PAGE_SIZE, page, paginate
+from serialization import DictResponse
+from principals import async_require_admin, principal_cache, require_admin
 
 router = APIRouter(prefix="/admin", tags=["Admin Tools"])
 
 @router.post("/make-admin/{user_id}")
-def make_admin(user_id: int, db: Session = Depends(get_db),
-               current_user: models.User = Depends(auth.get_current_user)
-               ):
-    # Only admins can promote others
-    if not current_user.is_admin:
-        raise HTTPException(status_code=403, detail="Only admin can promote users")
-    user = db.query(models.User).filter(models.User.id == user_id).first()
+async def make_admin(user_id: int, db: AsyncSession = Depends(get_async_db),
+                     admin=Depends(async_require_admin)
+                     ):
+    # Only admins can promote others (async_require_admin)
+    user = await async_crud.get_user(db, user_id)
 
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
-    user.is_admin = True
-    db.commit()
-    db.refresh(user)
+    await async_crud.set_user_admin(db, user)
 
     return {"message": f"User {user.email} is now an admin"}
 
+@router.post("/deactivate/{user_id}")
+async def deactivate_user(
+    user_id: int, db: AsyncSession = Depends(get_async_db), admin=Depends(async_require_admin)
+):
+    user = await async_crud.get_user(db, user_id)
+
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    await async_crud.set_user_active(db, user, False)
+    return {"message": f"User {user.email} is now inactive"}
+
+# Password hashing pool: queue depth and latency
+@router.get("/hashing")
+async def hashing_stats(admin=Depends(async_require_admin)):
+    return hashing.hashing_pool.stats()
+
+# Background job queue: counts per kind and status
+@router.get("/jobs")
+async def job_stats(db: AsyncSession = Depends(get_async_db), admin=Depends(async_require_admin)):
+    return await db.run_sync(jobs.stats)
+
+# Principal cache counters
+@router.get("/principal-cache")
+async def principal_cache_stats(admin=Depends(async_require_admin)):
+    return principal_cache.stats()
+
 # 1️⃣ Get all users
-@router.get("/users")
-def get_all_users(db: Session = Depends(get_db), admin=Depends(require_admin)):
-    return db.query(models.User).all()
+@router.get("/users", response_model=schemas.Page[schemas.AdminUserOut])
+async def get_all_users(
+    cursor: str | None = None,
+    limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE),
+    include_total: bool = False,
+    db: AsyncSession = Depends(get_async_db),
+    admin=Depends(async_require_admin)
+):
+    query = select(models.User)
+    total = await async_crud.count(db, query) if include_total else None
+
+    query = paginate(query, models.User.id, models.User.id, cursor, limit)
+    users, next_cursor = page((await db.execute(query)).scalars().all(), limit, key=lambda u: (u.id, u.id))
+    return {"items": users, "next_cursor": next_cursor, "total": total}
 
 
 # 2️⃣ Get all orders
-@router.get("/orders")
-def get_all_orders(db: Session = Depends(get_db), admin=Depends(require_admin)):
-    return db.query(models.Order).all()
+@router.get("/orders", response_model=schemas.Page[schemas.OrderSchema])
+async def get_all_orders(
+    cursor: str | None = None,
+    limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE),
+    include_total: bool = False,
+    db: AsyncSession = Depends(get_async_db),
+    admin=Depends(async_require_admin)
+):
+    query = select(models.Order)
+    total = await async_crud.count(db, query) if include_total else None
+    query = query.options(selectinload(models.Order.items))
+
+    query = paginate(query, models.Order.created_at, models.Order.id, cursor, limit, descending=True)
+    orders, next_cursor = page((await db.execute(query)).scalars().all(), limit, key=lambda o: (o.created_at, o.id))
+    return {"items": orders, "next_cursor": next_cursor, "total": total}
 
 
 # 3️⃣ Get revenue
-@router.get("/revenue")
-def get_revenue(db: Session = Depends(get_db), admin=Depends(require_admin)):
-    revenue = db.query(models.Order).all()
-    total = sum(order.total_amount for order in revenue)
-    return {"total_revenue": total}
+@router.get("/revenue", response_class=DictResponse)
+async def get_revenue(db: AsyncSession = Depends(get_async_db), admin=Depends(async_require_admin)):
+    by_status = {
+        name.split(":", 1)[1]: value
+        for name, value in (await async_crud.get_stats(db)).items()
+        if name.startswith("revenue:")
+    }
+    return {"total_revenue": sum(by_status.values()), "revenue_by_status": by_status}
 
 
 # 4️⃣ Low stock products
 @router.get("/low-stock")
-def low_stock(db: Session = Depends(get_db), admin=Depends(require_admin)):
-    products = db.query(models.Product).filter(models.Product.stock < 5).all()
-    return products
+async def low_stock(db: AsyncSession = Depends(get_async_db), admin=Depends(async_require_admin)):
+    return await async_crud.get_low_stock(db, 5)
 
 
 # 5️⃣ Basic sales stats
-@router.get("/stats")
-def dashboard_stats(db: Session = Depends(get_db), admin=Depends(require_admin)):
-    total_users = db.query(models.User).count()
-    total_orders = db.query(models.Order).count()
-    total_products = db.query(models.Product).count()
-
-    revenue = db.query(models.Order).all()
-    total_revenue = sum(o.total_amount for o in revenue)
+@router.get("/stats", response_class=DictResponse)
+async def dashboard_stats(db: AsyncSession = Depends(get_async_db), admin=Depends(async_require_admin)):
+    # Served from the stat_counters rollup instead of scanning the tables
+    stats = await async_crud.get_stats(db)
+    total_revenue = sum(v for name, v in stats.items() if name.startswith("revenue:"))
 
     return {
-        "total_users": total_users,
-        "total_orders": total_orders,
-        "total_products": total_products,
+        "total_users": int(stats.get("users", 0)),
+        "total_orders": int(stats.get("orders", 0)),
+        "total_products": int(stats.get("products", 0)),
         "total_revenue": total_revenue,
     }
+
+
+# Repair path for the rollup, e.g. after rows were fixed by hand in the database
+@router.post("/stats/rebuild", response_class=DictResponse)
+async def rebuild_stats(db: AsyncSession = Depends(get_async_db), admin=Depends(async_require_admin)):
+    await async_crud.rebuild_stats(db)
+    return await dashboard_stats(db, admin)
+
+
+# 6️⃣ Bulk product import (JSON array or NDJSON)
+# The import parses the upload and the export streams rows with blocking
+# code, so both stay sync handlers and run in the threadpool
+@router.post("/products/import")
+def import_products(
+    file: UploadFile = File(...),
+    batch_size: int = Query(catalog_import.DEFAULT_BATCH_SIZE, ge=1, le=10000),
+    db: Session = Depends(get_db),
+    admin=Depends(require_admin)
+):
+    return catalog_import.import_products(db, file.file, batch_size)
+
+
+# 7️⃣ Streaming exports for the warehouse sync
+@router.get("/export/{dataset}")
+def export_dataset(
+    dataset: Literal["products", "orders", "users"],
+    format: Literal["ndjson", "csv"] = "ndjson",
+    db: Session = Depends(get_db),
+    admin=Depends(require_admin)
+):
+    return exports.stream_export(db.get_bind(), dataset, format)
@@ -17,6 +17,10 @@ import models   # <-- VERY IMPORTANT
 # Alembic Config object
 config = context.config
 
+# DATABASE_URL from the environment wins over alembic.ini, same as the app
+if os.getenv("DATABASE_URL"):
+    config.set_main_option("sqlalchemy.url", os.environ["DATABASE_URL"])
+
 # Logging
 if config.config_file_name is not None:
     fileConfig(config.config_file_name)
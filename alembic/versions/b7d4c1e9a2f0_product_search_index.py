@@ -0,0 +1,36 @@
+"""product search index
+
+Revision ID: b7d4c1e9a2f0
+Revises: 3e1c9b75f2c5
+Create Date: 2026-10-18 10:12:04.318220
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7d4c1e9a2f0'
+down_revision: Union[str, Sequence[str], None] = '3e1c9b75f2c5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS products_fts "
+        "USING fts5(name, description, tokenize = 'unicode61 remove_diacritics 2')"
+    )
+    # Backfill the index from the existing catalog
+    op.execute(
+        "INSERT INTO products_fts (rowid, name, description) "
+        "SELECT id, coalesce(name, ''), coalesce(description, '') FROM products"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TABLE IF EXISTS products_fts")
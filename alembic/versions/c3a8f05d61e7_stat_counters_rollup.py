@@ -0,0 +1,42 @@
+"""stat counters rollup
+
+Revision ID: c3a8f05d61e7
+Revises: b7d4c1e9a2f0
+Create Date: 2026-10-18 11:40:27.902114
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3a8f05d61e7'
+down_revision: Union[str, Sequence[str], None] = 'b7d4c1e9a2f0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'stat_counters',
+        sa.Column('name', sa.String(), nullable=False),
+        sa.Column('value', sa.Float(), nullable=False),
+        sa.PrimaryKeyConstraint('name')
+    )
+    # Seed the rollup from the existing data
+    op.execute("INSERT INTO stat_counters (name, value) SELECT 'users', count(*) FROM users")
+    op.execute("INSERT INTO stat_counters (name, value) SELECT 'products', count(*) FROM products")
+    op.execute("INSERT INTO stat_counters (name, value) SELECT 'orders', count(*) FROM orders")
+    op.execute(
+        "INSERT INTO stat_counters (name, value) "
+        "SELECT 'revenue:' || status, coalesce(sum(total_amount), 0) "
+        "FROM orders GROUP BY status"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('stat_counters')
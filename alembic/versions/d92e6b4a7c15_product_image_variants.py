@@ -0,0 +1,28 @@
+"""product image variants
+
+Revision ID: d92e6b4a7c15
+Revises: c3a8f05d61e7
+Create Date: 2026-10-18 13:05:51.447390
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd92e6b4a7c15'
+down_revision: Union[str, Sequence[str], None] = 'c3a8f05d61e7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('product_images', sa.Column('variants', sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('product_images', 'variants')
@@ -0,0 +1,51 @@
+"""hot path indexes
+
+Revision ID: e5f1a7c3b920
+Revises: d92e6b4a7c15
+Create Date: 2026-10-18 15:12:08.331954
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5f1a7c3b920'
+down_revision: Union[str, Sequence[str], None] = 'd92e6b4a7c15'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Merge duplicate cart lines into the oldest one before making (user, product) unique
+    op.execute(
+        "UPDATE cart SET quantity = ("
+        "  SELECT sum(c.quantity) FROM cart c"
+        "  WHERE c.user_id = cart.user_id AND c.product_id = cart.product_id"
+        ") WHERE id IN (SELECT min(id) FROM cart GROUP BY user_id, product_id HAVING count(*) > 1)"
+    )
+    op.execute(
+        "DELETE FROM cart WHERE id NOT IN (SELECT min(id) FROM cart GROUP BY user_id, product_id)"
+    )
+    op.create_index('uq_cart_user_product', 'cart', ['user_id', 'product_id'], unique=True)
+    op.create_index('ix_orders_user_id_created_at', 'orders', ['user_id', 'created_at'], unique=False)
+    op.create_index(
+        'ix_order_status_history_order_id_timestamp', 'order_status_history',
+        ['order_id', 'timestamp'], unique=False
+    )
+    op.create_index('ix_addresses_user_id_is_primary', 'addresses', ['user_id', 'is_primary'], unique=False)
+    op.create_index('ix_products_is_active_price', 'products', ['is_active', 'price'], unique=False)
+    op.create_index('ix_products_stock', 'products', ['stock'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_products_stock', table_name='products')
+    op.drop_index('ix_products_is_active_price', table_name='products')
+    op.drop_index('ix_addresses_user_id_is_primary', table_name='addresses')
+    op.drop_index('ix_order_status_history_order_id_timestamp', table_name='order_status_history')
+    op.drop_index('ix_orders_user_id_created_at', table_name='orders')
+    op.drop_index('uq_cart_user_product', table_name='cart')
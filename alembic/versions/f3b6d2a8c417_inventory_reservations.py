@@ -0,0 +1,45 @@
+"""inventory reservations
+
+Revision ID: f3b6d2a8c417
+Revises: e5f1a7c3b920
+Create Date: 2026-10-18 16:27:44.902316
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3b6d2a8c417'
+down_revision: Union[str, Sequence[str], None] = 'e5f1a7c3b920'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('products', sa.Column('reserved', sa.Integer(), server_default='0', nullable=False))
+    op.create_table(
+        'reservations',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('product_id', sa.Integer(), nullable=False),
+        sa.Column('quantity', sa.Integer(), nullable=False),
+        sa.Column('expires_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['product_id'], ['products.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('uq_reservations_user_product', 'reservations', ['user_id', 'product_id'], unique=True)
+    op.create_index('ix_reservations_expires_at', 'reservations', ['expires_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_reservations_expires_at', table_name='reservations')
+    op.drop_index('uq_reservations_user_product', table_name='reservations')
+    op.drop_table('reservations')
+    with op.batch_alter_table('products') as batch_op:
+        batch_op.drop_column('reserved')
@@ -0,0 +1,210 @@
+"""
+Async counterparts of crud.py, for handlers that run on the event loop with
+an AsyncSession (see database.get_async_db).
+
+Relationships that the response schemas touch are eager-loaded here,
+because an AsyncSession cannot lazy-load them during serialization.
+
+Cart writes and checkout share their stock-hold logic (reservations.py)
+with the sync sweeper, so they run the crud.py implementation through
+AsyncSession.run_sync: the same code, on the request's connection, on the
+event loop rather than a threadpool slot.
+"""
+from sqlalchemy import case, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+import crud
+import models
+import principals
+
+
+# ---------- USER ----------
+async def get_user_by_email(db: AsyncSession, email: str):
+    result = await db.execute(select(models.User).where(models.User.email == email))
+    return result.scalars().first()
+
+async def get_user(db: AsyncSession, user_id: int):
+    return await db.get(models.User, user_id)
+
+async def set_user_active(db: AsyncSession, user: models.User, active: bool):
+    user.is_active = 1 if active else 0
+    await db.commit()
+    await db.refresh(user)
+    principals.principal_cache.invalidate(user.email)
+    return user
+
+async def set_user_admin(db: AsyncSession, user: models.User):
+    user.is_admin = True
+    await db.commit()
+    await db.refresh(user)
+    principals.principal_cache.invalidate(user.email)
+    return user
+
+
+# ---------------- PRODUCT ---------------- #
+
+async def get_product(db: AsyncSession, product_id: int, with_images: bool = True):
+    stmt = select(models.Product).where(models.Product.id == product_id)
+    if with_images:
+        stmt = stmt.options(selectinload(models.Product.images))
+    result = await db.execute(stmt)
+    return result.scalars().first()
+
+async def get_low_stock(db: AsyncSession, below: int):
+    result = await db.execute(select(models.Product).where(models.Product.stock < below))
+    return result.scalars().all()
+
+
+# ---------------- CART ---------------- #
+
+async def get_cart_view(db: AsyncSession, user_id: int):
+    """
+    Cart lines with product details, subtotals and the grand total in one query.
+
+    Lines whose product was deleted or deactivated are returned with
+    available=False and are left out of the total.
+    """
+    available = case(
+        (models.Product.id.is_(None), False),
+        (models.Product.is_active == False, False),
+        else_=True,
+    )
+    subtotal = models.Product.price * models.Cart.quantity
+
+    result = await db.execute(
+        select(
+            models.Cart.product_id,
+            models.Product.name,
+            models.Product.price,
+            models.Cart.quantity,
+            subtotal.label("subtotal"),
+            available.label("available"),
+            func.sum(case((available, subtotal), else_=0)).over().label("total_price"),
+        )
+        .outerjoin(models.Product, models.Product.id == models.Cart.product_id)
+        .where(models.Cart.user_id == user_id)
+        .order_by(models.Cart.id)
+    )
+    return result.all()
+
+async def add_to_cart(db: AsyncSession, user_id: int, product_id: int, quantity: int):
+    return await db.run_sync(crud.add_to_cart, user_id, product_id, quantity)
+
+async def update_cart_quantity(db: AsyncSession, user_id: int, product_id: int, quantity: int):
+    return await db.run_sync(crud.update_cart_quantity, user_id, product_id, quantity)
+
+async def remove_from_cart(db: AsyncSession, user_id: int, product_id: int):
+    return await db.run_sync(crud.remove_from_cart, user_id, product_id)
+
+async def apply_cart_batch(db: AsyncSession, user_id: int, operations):
+    return await db.run_sync(crud.apply_cart_batch, user_id, operations)
+
+
+# ---------------- ORDER ---------------- #
+
+async def create_order_from_cart(db: AsyncSession, user_id: int):
+    order = await db.run_sync(crud.create_order_from_cart, user_id)
+    if order is not None:
+        await db.refresh(order, ["items"])
+    return order
+
+async def get_user_order(db: AsyncSession, user_id: int, order_id: int, options=()):
+    result = await db.execute(
+        select(models.Order)
+        .where(models.Order.id == order_id, models.Order.user_id == user_id)
+        .options(*options)
+    )
+    return result.scalars().first()
+
+async def get_order(db: AsyncSession, order_id: int):
+    return await db.get(models.Order, order_id)
+
+async def get_order_timeline(db: AsyncSession, order_id: int):
+    result = await db.execute(
+        select(models.OrderStatusHistory)
+        .where(models.OrderStatusHistory.order_id == order_id)
+        .order_by(models.OrderStatusHistory.timestamp.asc())
+    )
+    return result.scalars().all()
+
+async def set_order_status(db: AsyncSession, order: models.Order, status: str):
+    """Change an order's status and move its revenue to the new bucket (no commit)."""
+    if order.status != status:
+        await bump_stats(db, {
+            f"revenue:{order.status}": -(order.total_amount or 0),
+            f"revenue:{status}": order.total_amount or 0,
+        })
+    order.status = status
+
+
+# ---------------- ADDRESS ---------------- #
+
+async def list_addresses(db: AsyncSession, user_id: int):
+    result = await db.execute(select(models.Address).where(models.Address.user_id == user_id))
+    return result.scalars().all()
+
+async def _clear_primary(db: AsyncSession, user_id: int):
+    await db.execute(
+        update(models.Address).where(models.Address.user_id == user_id).values(is_primary=False)
+    )
+
+async def create_address(db: AsyncSession, user_id: int, data):
+    # If new address is primary → set all others to false
+    if data.is_primary:
+        await _clear_primary(db, user_id)
+    address = models.Address(user_id=user_id, **data.model_dump())
+    db.add(address)
+    await db.commit()
+    await db.refresh(address)
+    return address
+
+async def _get_user_address(db: AsyncSession, user_id: int, address_id: int):
+    result = await db.execute(
+        select(models.Address).where(models.Address.id == address_id, models.Address.user_id == user_id)
+    )
+    return result.scalars().first()
+
+async def set_primary_address(db: AsyncSession, user_id: int, address_id: int):
+    addr = await _get_user_address(db, user_id, address_id)
+    if not addr:
+        return None
+
+    await _clear_primary(db, user_id)
+    addr.is_primary = True
+    await db.commit()
+    await db.refresh(addr)
+    return addr
+
+async def delete_address(db: AsyncSession, user_id: int, address_id: int):
+    address = await _get_user_address(db, user_id, address_id)
+    if not address:
+        return False
+
+    await db.delete(address)
+    await db.commit()
+    return True
+
+
+# ---------------- STATS ROLLUP ---------------- #
+
+async def bump_stats(db: AsyncSession, deltas: dict):
+    """Add `deltas` to the named counters in one upsert. Does not commit."""
+    stmt = crud.stats_upsert(db, deltas)
+    if stmt is not None:
+        await db.execute(stmt)
+
+async def get_stats(db: AsyncSession) -> dict:
+    result = await db.execute(select(models.StatCounter.name, models.StatCounter.value))
+    return dict(result.all())
+
+async def rebuild_stats(db: AsyncSession):
+    await db.run_sync(crud.rebuild_stats)
+
+
+# ---------------- HELPERS ---------------- #
+
+async def count(db: AsyncSession, stmt) -> int:
+    """COUNT(*) over the rows a select() would return."""
+    subquery = stmt.order_by(None).subquery()
+    return (await db.execute(select(func.count()).select_from(subquery))).scalar_one()
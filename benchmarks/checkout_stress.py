@@ -0,0 +1,279 @@
+"""
+Concurrent checkout stress test with oversell detection.
+
+A small pool of products is created with enough stock for every cart,
+then every virtual shopper signs up, sets a primary address and fills a
+cart from that pool. Cart lines hold their units, so the carts are
+filled first and the stock is then written down to --stock. The carts
+now ask for more units than exist, and every shopper calls POST
+/orders/ at the same moment to compete for them.
+
+It reports checkout throughput and latency, and a breakdown of outcomes:
+orders placed, out-of-stock rejections (also reported on their own
+next to the units carted and available), and server errors. With a local
+server it also counts "database is locked" errors in the server log.
+Afterwards it reads /admin/export/products and /admin/export/orders and
+checks that no product went below zero stock. For every product it also
+checks that the written-down stock minus the units in placed orders equals
+the final stock. The exit status is 1 if any check fails.
+
+    python -m benchmarks.checkout_stress --shoppers 200 --products 5 --stock 20
+    python -m benchmarks.checkout_stress --workers 4 --output bench_results_checkout.json
+
+Without --base-url a fresh server is started on a temporary SQLite
+database (see benchmarks.loadtest).
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime, timezone
+
+import httpx
+
+from benchmarks.loadtest import ADDRESS, git_revision, login, percentile, start_local_server
+
+LOCK_ERROR = "database is locked"
+
+
+def product_body(i, stock):
+    return {"name": f"Flash Sale Item {i}", "description": "checkout stress", "price": 10 + i, "stock": stock}
+
+
+async def create_products(client, headers, count, stock):
+    """Create the pool. Returns {product_id: index}."""
+    products = {}
+    for i in range(count):
+        response = await client.post("/products/", headers=headers, json=product_body(i, stock))
+        response.raise_for_status()
+        products[response.json()["id"]] = i
+    return products
+
+
+async def write_down_stock(client, headers, products, stock):
+    """Cut every product to `stock` once the carts hold more than that. Returns {product_id: stock}."""
+    for product_id, i in products.items():
+        response = await client.put(f"/products/{product_id}", headers=headers, json=product_body(i, stock))
+        response.raise_for_status()
+    return {product_id: stock for product_id in products}
+
+
+async def prepare_shopper(client, gate, user_no, product_ids, args, outcomes, carted_units):
+    """Sign up, add an address and fill a cart. Returns auth headers, or None without a cart."""
+    async with gate:
+        headers = await login(client, f"stress{user_no}@example.com", "bench-password")
+        await client.post("/addresses/", headers=headers, json=ADDRESS)
+
+        carted = 0
+        for product_id in random.sample(product_ids, min(args.lines, len(product_ids))):
+            quantity = random.randint(1, args.max_quantity)
+            response = await client.post("/cart/", headers=headers, json={
+                "product_id": product_id, "quantity": quantity,
+            })
+            if response.status_code == 200:
+                carted += 1
+                carted_units[product_id] += quantity
+            else:
+                outcomes[f"cart_{response.status_code}"] += 1
+    return headers if carted else None
+
+
+def classify(response):
+    if response is None:
+        return "transport_error"
+    if response.status_code == 200:
+        return "ordered"
+    if response.status_code == 400 and "stock" in response.text.lower():
+        return "out_of_stock"
+    if response.status_code >= 500:
+        return "server_error"
+    return f"status_{response.status_code}"
+
+
+async def checkout(client, go, headers, latencies, outcomes):
+    await go.wait()
+    started = time.perf_counter()
+    try:
+        response = await client.post("/orders/", headers=headers)
+    except httpx.HTTPError:
+        response = None
+    latencies.append(time.perf_counter() - started)
+    outcomes[classify(response)] += 1
+
+
+async def read_ndjson(client, headers, dataset):
+    response = await client.get(f"/admin/export/{dataset}", headers=headers, params={"format": "ndjson"})
+    response.raise_for_status()
+    return [json.loads(line) for line in response.text.splitlines() if line]
+
+
+def check_inventory(initial: dict, products: list, orders: list, placed: int) -> list:
+    """Return a list of invariant violations (empty when stock is consistent)."""
+    sold = Counter()
+    stress_orders = 0
+    for order in orders:
+        items = [item for item in order["items"] if item["product_id"] in initial]
+        if items:
+            stress_orders += 1
+        for item in items:
+            sold[item["product_id"]] += item["quantity"]
+
+    problems = []
+    final = {p["id"]: p for p in products if p["id"] in initial}
+    for product_id, start in initial.items():
+        product = final.get(product_id)
+        if product is None:
+            problems.append(f"product {product_id} missing from export")
+            continue
+        if product["stock"] < 0:
+            problems.append(f"product {product_id} oversold: stock {product['stock']}")
+        if product.get("reserved", 0) < 0:
+            problems.append(f"product {product_id} has negative reserved {product['reserved']}")
+        if start - sold[product_id] != product["stock"]:
+            problems.append(
+                f"product {product_id}: start {start} - sold {sold[product_id]} != stock {product['stock']}"
+            )
+    if stress_orders != placed:
+        problems.append(f"{placed} checkouts succeeded but {stress_orders} orders were stored")
+    return problems
+
+
+async def run(args) -> dict:
+    outcomes = Counter()
+    latencies = []
+    limits = httpx.Limits(max_connections=args.shoppers + 5)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout, limits=limits) as client:
+        admin_headers = await login(client, "stress-admin@example.com", "bench-password", is_admin=True)
+        # Enough stock that no cart is turned away by another cart's holds
+        pool = await create_products(client, admin_headers, args.products, args.shoppers * args.max_quantity)
+        product_ids = list(pool)
+
+        gate = asyncio.Semaphore(args.setup_concurrency)
+        carted_units = Counter()
+        shoppers = await asyncio.gather(*[
+            prepare_shopper(client, gate, n, product_ids, args, outcomes, carted_units)
+            for n in range(args.shoppers)
+        ])
+        shoppers = [headers for headers in shoppers if headers is not None]
+        initial = await write_down_stock(client, admin_headers, pool, args.stock)
+
+        go = asyncio.Event()
+        tasks = [
+            asyncio.create_task(checkout(client, go, headers, latencies, outcomes))
+            for headers in shoppers
+        ]
+        await asyncio.sleep(0.1)     # let every task reach go.wait()
+        started = time.perf_counter()
+        go.set()
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - started
+
+        products = await read_ndjson(client, admin_headers, "products")
+        orders = await read_ndjson(client, admin_headers, "orders")
+
+    ordered = sorted(latencies)
+    attempts = len(ordered)
+    failures = outcomes["server_error"] + outcomes["transport_error"]
+    return {
+        "checkout_attempts": attempts,
+        "elapsed_s": round(elapsed, 3),
+        "checkouts_per_s": round(outcomes["ordered"] / elapsed, 2) if elapsed else 0.0,
+        "attempts_per_s": round(attempts / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(percentile(ordered, 50) * 1000, 2),
+        "p95_ms": round(percentile(ordered, 95) * 1000, 2),
+        "p99_ms": round(percentile(ordered, 99) * 1000, 2),
+        "outcomes": dict(outcomes),
+        "error_rate": round(failures / attempts, 4) if attempts else 0.0,
+        "out_of_stock": outcomes["out_of_stock"],
+        "units_carted": sum(carted_units.values()),
+        "units_available": sum(initial.values()),
+        "problems": check_inventory(initial, products, orders, outcomes["ordered"]),
+    }
+
+
+def count_lock_errors(log_path: str) -> int:
+    try:
+        with open(log_path, errors="replace") as fp:
+            return sum(line.count(LOCK_ERROR) for line in fp)
+    except OSError:
+        return 0
+
+
+def print_report(summary: dict):
+    print(
+        f"{summary['checkout_attempts']} checkouts in {summary['elapsed_s']}s: "
+        f"{summary['checkouts_per_s']} orders/s, {summary['attempts_per_s']} attempts/s"
+    )
+    print(f"latency p50 {summary['p50_ms']} ms, p95 {summary['p95_ms']} ms, p99 {summary['p99_ms']} ms")
+    print("outcomes: " + ", ".join(f"{name}={count}" for name, count in sorted(summary["outcomes"].items())))
+    print(
+        f"out of stock: {summary['out_of_stock']} checkouts "
+        f"({summary['units_carted']} units carted, {summary['units_available']} available)"
+    )
+    print(f"error rate {summary['error_rate']:.2%}", end="")
+    if summary.get("lock_errors") is not None:
+        print(f", '{LOCK_ERROR}' in server log: {summary['lock_errors']}", end="")
+    print()
+    if summary["problems"]:
+        print("INVENTORY CHECK FAILED:")
+        for problem in summary["problems"]:
+            print(f"  - {problem}")
+    else:
+        print("inventory check passed: no negative stock, stock matches order items")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", help="Target server; default starts a local one")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes for the local server")
+    parser.add_argument("--shoppers", type=int, default=100, help="Concurrent checkouts")
+    parser.add_argument("--products", type=int, default=5, help="Size of the low-stock product pool")
+    parser.add_argument("--stock", type=int, default=20, help="Stock per product once the carts are full")
+    parser.add_argument("--lines", type=int, default=2, help="Products per cart")
+    parser.add_argument("--max-quantity", type=int, default=3, help="Largest quantity per cart line")
+    parser.add_argument("--setup-concurrency", type=int, default=20, help="Shoppers set up at once")
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--output", default="bench_results_checkout.json", help="JSON results file")
+    args = parser.parse_args(argv)
+
+    server = None
+    log_path = None
+    workdir = tempfile.TemporaryDirectory()
+    try:
+        if not args.base_url:
+            log_path = os.path.join(workdir.name, "server.log")
+            server, args.base_url = start_local_server(workdir.name, args.workers, log_path)
+        summary = asyncio.run(run(args))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=10)
+        lock_errors = count_lock_errors(log_path) if log_path else None
+        workdir.cleanup()
+
+    summary["lock_errors"] = lock_errors
+    results = {
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "git_revision": git_revision(),
+        "config": {
+            "base_url": args.base_url, "workers": args.workers, "shoppers": args.shoppers,
+            "products": args.products, "stock": args.stock, "lines": args.lines,
+            "max_quantity": args.max_quantity,
+        },
+        **summary,
+    }
+    with open(args.output, "w") as fp:
+        json.dump(results, fp, indent=2)
+
+    print_report(summary)
+    if summary["problems"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
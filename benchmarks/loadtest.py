@@ -0,0 +1,276 @@
+"""
+Load test for the core shopper flows.
+
+Each virtual user signs up, sets a primary address and then loops through
+a realistic session: browse /products/, search, open a product, add to
+cart, view the cart, check out, and pay. One extra virtual user acts as
+an admin polling /admin/stats and /admin/revenue like the dashboard does.
+
+Per endpoint it reports requests/s, error count and p50/p95/p99 latency,
+and writes everything to a JSON file so runs can be compared:
+
+    python -m benchmarks.loadtest --concurrency 20 --duration 30 --output run.json
+    python -m benchmarks.loadtest --baseline run.json --output run2.json
+
+Without --base-url a fresh server is started on a temporary SQLite
+database (uvicorn main:app) and stopped afterwards.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SEARCH_TERMS = ["wireless", "smart", "laptop", "keyboard", "usb", "head", "stand", "pro"]
+ADDRESS = {
+    "full_name": "Load Tester", "phone": "0000000000", "street": "1 Bench Road",
+    "city": "Kolkata", "state": "WB", "pincode": "700001", "is_primary": True,
+}
+
+
+class Recorder:
+    def __init__(self):
+        self.samples = defaultdict(list)    # endpoint -> [seconds]
+        self.errors = defaultdict(int)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+
+    async def call(self, client, label, method, url, **kwargs):
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+        except httpx.HTTPError:
+            self.samples[label].append(time.perf_counter() - started)
+            self.errors[label] += 1
+            self.statuses[label]["error"] += 1
+            return None
+        self.samples[label].append(time.perf_counter() - started)
+        self.statuses[label][str(response.status_code)] += 1
+        if response.status_code >= 400:
+            self.errors[label] += 1
+        return response
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize(recorder: Recorder, elapsed: float) -> dict:
+    endpoints = {}
+    for label, samples in sorted(recorder.samples.items()):
+        ordered = sorted(samples)
+        endpoints[label] = {
+            "requests": len(ordered),
+            "errors": recorder.errors[label],
+            "statuses": dict(recorder.statuses[label]),
+            "rps": round(len(ordered) / elapsed, 2),
+            "p50_ms": round(percentile(ordered, 50) * 1000, 2),
+            "p95_ms": round(percentile(ordered, 95) * 1000, 2),
+            "p99_ms": round(percentile(ordered, 99) * 1000, 2),
+        }
+    total = sum(e["requests"] for e in endpoints.values())
+    return {"total_requests": total, "total_rps": round(total / elapsed, 2), "endpoints": endpoints}
+
+
+async def login(client, email, password, is_admin=False):
+    await client.post("/signup", json={"email": email, "password": password, "is_admin": is_admin})
+    response = await client.post("/token", data={"username": email, "password": password})
+    response.raise_for_status()
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+async def seed_catalog(client, headers, count):
+    words = ["Wireless", "Smart", "Laptop", "Keyboard", "USB", "Head", "Stand", "Pro", "Mini", "Max"]
+    lines = [
+        json.dumps({
+            "name": f"{random.choice(words)} {random.choice(words)} {i}",
+            "description": f"{random.choice(words)} benchmark product {i}",
+            "price": round(random.uniform(5, 500), 2),
+            "stock": 1_000_000,
+        })
+        for i in range(count)
+    ]
+    response = await client.post(
+        "/admin/products/import",
+        headers=headers,
+        files={"file": ("catalog.ndjson", "\n".join(lines).encode(), "application/x-ndjson")},
+    )
+    response.raise_for_status()
+    first = await client.get("/products/", params={"limit": 100})
+    return [p["id"] for p in first.json()["items"]]
+
+
+async def shopper(client, recorder, user_no, product_ids, deadline):
+    headers = await login(client, f"shopper{user_no}@example.com", "bench-password")
+    await client.post("/addresses/", headers=headers, json=ADDRESS)
+
+    while time.monotonic() < deadline:
+        await recorder.call(client, "GET /products/", "GET", "/products/", params={"limit": 20})
+        await recorder.call(
+            client, "GET /products/?search", "GET", "/products/",
+            params={"search": random.choice(SEARCH_TERMS), "limit": 20},
+        )
+        product_id = random.choice(product_ids)
+        await recorder.call(client, "GET /products/{id}", "GET", f"/products/{product_id}")
+        await recorder.call(
+            client, "POST /cart/", "POST", "/cart/", headers=headers,
+            json={"product_id": product_id, "quantity": random.randint(1, 3)},
+        )
+        await recorder.call(client, "GET /cart/", "GET", "/cart/", headers=headers)
+        order = await recorder.call(client, "POST /orders/", "POST", "/orders/", headers=headers)
+        if order is not None and order.status_code == 200:
+            await recorder.call(
+                client, "POST /orders/{id}/pay", "POST", f"/orders/{order.json()['id']}/pay",
+                headers=headers,
+            )
+
+
+async def admin_dashboard(client, recorder, headers, deadline, interval):
+    while time.monotonic() < deadline:
+        await recorder.call(client, "GET /admin/stats", "GET", "/admin/stats", headers=headers)
+        await recorder.call(client, "GET /admin/revenue", "GET", "/admin/revenue", headers=headers)
+        await asyncio.sleep(interval)
+
+
+async def run(args) -> dict:
+    recorder = Recorder()
+    limits = httpx.Limits(max_connections=args.concurrency + 5)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout, limits=limits) as client:
+        admin_headers = await login(client, "admin@example.com", "bench-password", is_admin=True)
+        product_ids = await seed_catalog(client, admin_headers, args.products)
+
+        deadline = time.monotonic() + args.duration
+        started = time.perf_counter()
+        tasks = [shopper(client, recorder, n, product_ids, deadline) for n in range(args.concurrency)]
+        tasks.append(admin_dashboard(client, recorder, admin_headers, deadline, args.admin_interval))
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - started
+
+    return summarize(recorder, elapsed)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_local_server(workdir: str, workers: int = 1, log_path: str | None = None):
+    """
+    Start uvicorn on a throwaway database and wait until it answers.
+
+    With `log_path`, the server's stderr (tracebacks included) goes to that file.
+    """
+    env = dict(os.environ)
+    env.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(workdir, 'bench.db')}")
+    env.setdefault("BCRYPT_ROUNDS", "4")
+    subprocess.run(
+        [sys.executable, "-c", "import models; from database import Base, engine; Base.metadata.create_all(engine)"],
+        cwd=ROOT, env=env, check=True,
+    )
+
+    port = free_port()
+    stderr = open(log_path, "w") if log_path else None
+    server = subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "main:app", "--port", str(port),
+            "--workers", str(workers), "--log-level", "warning",
+        ],
+        cwd=ROOT, env=env, stderr=stderr,
+    )
+    if stderr is not None:
+        stderr.close()
+    base_url = f"http://127.0.0.1:{port}"
+    for _ in range(100):
+        try:
+            httpx.get(f"{base_url}/docs", timeout=1)
+            return server, base_url
+        except httpx.HTTPError:
+            if server.poll() is not None:
+                raise RuntimeError("uvicorn exited during startup")
+            time.sleep(0.1)
+    server.terminate()
+    raise RuntimeError("uvicorn did not start in time")
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True, stderr=subprocess.DEVNULL
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_report(summary: dict, baseline: dict | None):
+    print(f"{'endpoint':<24}{'req':>8}{'err':>6}{'rps':>9}{'p50':>9}{'p95':>9}{'p99':>9}")
+    for label, stats in summary["endpoints"].items():
+        line = (
+            f"{label:<24}{stats['requests']:>8}{stats['errors']:>6}{stats['rps']:>9}"
+            f"{stats['p50_ms']:>9}{stats['p95_ms']:>9}{stats['p99_ms']:>9}"
+        )
+        before = (baseline or {}).get("endpoints", {}).get(label)
+        if before and before["p95_ms"]:
+            change = 100 * (stats["p95_ms"] - before["p95_ms"]) / before["p95_ms"]
+            line += f"   p95 {change:+.1f}% vs baseline"
+        print(line)
+    print(f"total: {summary['total_requests']} requests, {summary['total_rps']} req/s")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", help="Target server; default starts a local one")
+    parser.add_argument("--concurrency", type=int, default=10, help="Concurrent shoppers")
+    parser.add_argument("--duration", type=float, default=20, help="Seconds to run")
+    parser.add_argument("--products", type=int, default=500, help="Products to seed")
+    parser.add_argument("--admin-interval", type=float, default=2, help="Seconds between dashboard polls")
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--output", default="bench_results.json", help="JSON results file")
+    parser.add_argument("--baseline", help="Earlier results file to compare p95 against")
+    args = parser.parse_args(argv)
+
+    server = None
+    workdir = tempfile.TemporaryDirectory()
+    try:
+        if not args.base_url:
+            server, args.base_url = start_local_server(workdir.name)
+        summary = asyncio.run(run(args))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=10)
+        workdir.cleanup()
+
+    results = {
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "git_revision": git_revision(),
+        "config": {
+            "base_url": args.base_url, "concurrency": args.concurrency,
+            "duration": args.duration, "products": args.products,
+        },
+        **summary,
+    }
+    with open(args.output, "w") as fp:
+        json.dump(results, fp, indent=2)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as fp:
+            baseline = json.load(fp)
+    print_report(summary, baseline)
+
+
+if __name__ == "__main__":
+    main()
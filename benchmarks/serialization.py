@@ -0,0 +1,120 @@
+"""
+Micro-benchmark for response serialization of /products/ and /orders/ pages.
+
+Builds in-memory ORM objects shaped like the real payloads (products with
+images, orders with line items) and times each way of turning a page of
+them into JSON bytes:
+
+    stdlib           validate, dump to Python (mode="json"), json.dumps
+                     (FastAPI's path when a response class is set)
+    orjson           validate, dump to Python (mode="json"), orjson.dumps
+    fastapi_default  validate, dump_json through a TypeAdapter
+                     (FastAPI's path for response_model with the default class)
+    model_response   Schema.model_validate(...).model_dump_json()
+                     (serialization.model_response)
+
+No database or server is involved:
+
+    python -m benchmarks.serialization --items 20 100 --repeat 200
+"""
+import argparse
+import json
+import time
+from datetime import datetime
+
+from pydantic import TypeAdapter
+
+import models
+import schemas
+from serialization import ORJSON_AVAILABLE
+
+if ORJSON_AVAILABLE:
+    import orjson
+
+
+def product_page(count: int) -> dict:
+    products = []
+    for i in range(count):
+        product = models.Product(
+            id=i, name=f"Wireless Headphones {i}", description="Noise cancelling, 30h battery " * 3,
+            price=199.99 + i, stock=50, is_active=True,
+        )
+        product.images = [
+            models.ProductImage(
+                id=i * 3 + n, file_path=f"/uploads/products/{i}-{n}.webp",
+                variants={size: f"/uploads/products/variants/{i}-{n}-{size}.webp" for size in ("thumb", "card", "detail")},
+            )
+            for n in range(3)
+        ]
+        products.append(product)
+    return {"items": products, "next_cursor": "WzEwMCwxMDBd", "total": None}
+
+
+def order_page(count: int) -> dict:
+    orders = []
+    for i in range(count):
+        order = models.Order(
+            id=i, user_id=1, total_amount=420.5, status="Paid", created_at=datetime(2026, 1, 1, 12, 0),
+            shipping_name="Buyer Name", shipping_phone="9999999999", shipping_address="1 Long Street Name",
+            shipping_city="Kolkata", shipping_state="WB", shipping_pincode="700001",
+        )
+        order.items = [
+            models.OrderItem(product_id=n, quantity=1 + n % 3, price=19.99 + n) for n in range(4)
+        ]
+        orders.append(order)
+    return {"items": orders, "next_cursor": "WzEwMCwxMDBd", "total": None}
+
+
+def strategies(schema):
+    adapter = TypeAdapter(schema)
+    found = {
+        "stdlib": lambda payload: json.dumps(
+            adapter.dump_python(adapter.validate_python(payload), mode="json")
+        ).encode(),
+        "fastapi_default": lambda payload: adapter.dump_json(adapter.validate_python(payload)),
+        "model_response": lambda payload: schema.model_validate(payload).model_dump_json().encode(),
+    }
+    if ORJSON_AVAILABLE:
+        found["orjson"] = lambda payload: orjson.dumps(
+            adapter.dump_python(adapter.validate_python(payload), mode="json")
+        )
+    return found
+
+
+def measure(fn, payload, repeat: int) -> float:
+    """Best-of-3 mean microseconds per call."""
+    fn(payload)     # warm up schema/serializer caches
+    best = float("inf")
+    for _ in range(3):
+        started = time.perf_counter()
+        for _ in range(repeat):
+            fn(payload)
+        best = min(best, (time.perf_counter() - started) / repeat)
+    return best * 1e6
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, nargs="+", default=[20, 100], help="Page sizes to test")
+    parser.add_argument("--repeat", type=int, default=200, help="Calls per timing run")
+    args = parser.parse_args(argv)
+
+    cases = [
+        ("/products/", schemas.Page[schemas.Product], product_page),
+        ("/orders/", schemas.Page[schemas.OrderSchema], order_page),
+    ]
+    print(f"{'payload':<12}{'items':>6}  {'strategy':<16}{'us/page':>10}{'bytes':>9}{'vs stdlib':>11}")
+    for label, schema, build in cases:
+        for count in args.items:
+            payload = build(count)
+            results = {
+                name: (measure(fn, payload, args.repeat), len(fn(payload)))
+                for name, fn in strategies(schema).items()
+            }
+            baseline = results["stdlib"][0]
+            for name, (micros, size) in results.items():
+                print(f"{label:<12}{count:>6}  {name:<16}{micros:>10.1f}{size:>9}{baseline / micros:>10.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,75 +1,75 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from database import get_db
-from auth import get_current_user
-import crud
-import models
-from schemas import CartItemCreate, CartItemOut
+from database import get_async_db
+from principals import async_current_user
+import async_crud
+from schemas import CartBatch, CartItemCreate, CartItemOut
+from serialization import DictResponse
 
 router = APIRouter(prefix="/cart", tags=["Cart"])
 
 
 # Add to Cart
 @router.post("/", response_model=CartItemOut)
-def add_item_to_cart(
+async def add_item_to_cart(
     item: CartItemCreate,
-    db: Session = Depends(get_db),
-    user=Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    user=Depends(async_current_user)
 ):
     # Check if product exists
-    product = db.query(models.Product).filter(
-        models.Product.id == item.product_id
-    ).first()
+    product = await async_crud.get_product(db, item.product_id, with_images=False)
 
     if not product:
         raise HTTPException(404, "Product does not exist")
 
-    cart_item = crud.add_to_cart(db, user.id, item.product_id, item.quantity)
+    cart_item = await async_crud.add_to_cart(db, user.id, item.product_id, item.quantity)
     return cart_item
 
 
-# View Cart (with total price)
-@router.get("/")
-def view_cart(
-    db: Session = Depends(get_db),
-    user=Depends(get_current_user)
+# Apply many cart changes at once (offline cart sync)
+@router.post("/batch", response_model=list[CartItemOut])
+async def batch_update_cart(
+    batch: CartBatch,
+    db: AsyncSession = Depends(get_async_db),
+    user=Depends(async_current_user)
 ):
-    items = crud.get_cart_items(db, user.id)
-
-    fixed_items = []
-    total = 0
-
-    for item in items:
-        if not item.product:     # Skip broken/invalid entries
-            continue
+    return await async_crud.apply_cart_batch(db, user.id, batch.operations)
 
-        subtotal = item.product.price * item.quantity
-        total += subtotal
 
-        fixed_items.append({
-            "product_id": item.product_id,
-            "name": item.product.name,
-            "price": item.product.price,
-            "quantity": item.quantity,
-            "subtotal": subtotal
-        })
+# View Cart (with total price)
+@router.get("/", response_class=DictResponse)
+async def view_cart(
+    db: AsyncSession = Depends(get_async_db),
+    user=Depends(async_current_user)
+):
+    rows = await async_crud.get_cart_view(db, user.id)
 
     return {
-        "items": fixed_items,
-        "total_price": total
+        "items": [
+            {
+                "product_id": row.product_id,
+                "name": row.name,
+                "price": row.price,
+                "quantity": row.quantity,
+                "subtotal": row.subtotal,
+                "available": bool(row.available),
+            }
+            for row in rows
+        ],
+        "total_price": rows[0].total_price if rows else 0
     }
 
 
-# Update Quantity
+# Update Quantity (0 removes the line)
 @router.put("/{product_id}", response_model=CartItemOut)
-def update_cart(
+async def update_cart(
     product_id: int,
-    quantity: int,
-    db: Session = Depends(get_db),
-    user=Depends(get_current_user)
+    quantity: int = Query(..., ge=0),
+    db: AsyncSession = Depends(get_async_db),
+    user=Depends(async_current_user)
 ):
-    updated = crud.update_cart_quantity(db, user.id, product_id, quantity)
+    updated = await async_crud.update_cart_quantity(db, user.id, product_id, quantity)
     if not updated:
         raise HTTPException(404, "Item not found in cart")
 
@@ -78,13 +78,13 @@ def update_cart(
 
 # Remove from Cart
 @router.delete("/{product_id}")
-def remove_from_cart(
+async def remove_from_cart(
     product_id: int,
-    db: Session = Depends(get_db),
-    user=Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    user=Depends(async_current_user)
 ):
-    deleted = crud.remove_from_cart(db, user.id, product_id)
+    deleted = await async_crud.remove_from_cart(db, user.id, product_id)
     if not deleted:
         raise HTTPException(404, "Item not found")
 
-    return {"message": "Item removed from cart"}
\ No newline at end of file
+    return {"message": "Item removed from cart"}
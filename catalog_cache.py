@@ -0,0 +1,122 @@
+"""
+In-process response cache for the public product catalog.
+
+GET /products/{id} and GET /products/ keep their serialized JSON here,
+keyed by product id or by the normalized filter set, with a strong ETag.
+A request whose If-None-Match matches a cached ETag gets a 304 without
+touching the database. Writes to the catalog invalidate entries
+through invalidate_product().
+
+Every invalidation bumps a generation counter. A request reads it before
+its database fetch and passes it to put(); if an invalidation ran in
+between, the fetched body may predate it and is not stored.
+
+The cache is per process: with several workers, each one warms and
+invalidates its own copy.
+"""
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+from fastapi import Request, Response
+
+CATALOG_CACHE_SIZE = int(os.getenv("CATALOG_CACHE_SIZE", "512"))
+
+
+class CachedResponse:
+    __slots__ = ("body", "etag", "product_ids")
+
+    def __init__(self, body: bytes, product_ids: frozenset):
+        self.body = body
+        self.etag = '"' + hashlib.sha256(body).hexdigest() + '"'
+        self.product_ids = product_ids
+
+    def not_modified(self, request: Request) -> bool:
+        header = request.headers.get("if-none-match")
+        if not header:
+            return False
+        tags = {tag.strip() for tag in header.split(",")}
+        return "*" in tags or self.etag in tags
+
+    def to_response(self, request: Request) -> Response:
+        headers = {"ETag": self.etag, "Cache-Control": "no-cache"}
+        if self.not_modified(request):
+            return Response(status_code=304, headers=headers)
+        return Response(self.body, media_type="application/json", headers=headers)
+
+
+class ResponseCache:
+    def __init__(self, maxsize: int = CATALOG_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, body: bytes, product_ids=(), generation: int | None = None) -> CachedResponse:
+        """Store and return an entry. Not stored if `generation` is older than the cache's."""
+        entry = CachedResponse(body, frozenset(product_ids))
+        if self.maxsize <= 0:
+            return entry
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return entry
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return entry
+
+    def invalidate_product(self, product_id: int, membership_changed: bool = True):
+        """
+        Drop the product's own entry and every list page that may show it.
+
+        When the change cannot move the product in or out of a filtered list
+        (e.g. only stock changed), only lists that contain it are dropped.
+        Otherwise every cached list is.
+        """
+        with self._lock:
+            self.generation += 1
+            for key in list(self._entries):
+                if key[0] == "product":
+                    stale = key[1] == product_id
+                else:
+                    stale = membership_changed or product_id in self._entries[key].product_ids
+                if stale:
+                    del self._entries[key]
+
+    def invalidate_all(self):
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+catalog_cache = ResponseCache()
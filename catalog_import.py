@@ -0,0 +1,256 @@
+"""
+Bulk catalog import from a JSON array (like product.json) or NDJSON.
+
+Records are parsed one at a time from the stream, validated with
+ProductCreate and written in batches: one executemany INSERT for new
+products and one executemany UPDATE for existing ones per batch, each
+batch in its own transaction. A batch the database rejects is rolled
+back and its rows are reported as failed; earlier batches stay committed. A record with an "id" updates that
+product (or creates it with that id). A record without one is matched
+by name. Optional fields a record leaves out keep their current values
+on update and take the schema defaults on insert.
+
+Usable from the admin API (POST /admin/products/import) or the CLI:
+
+    python catalog_import.py product.json --batch-size 1000
+"""
+import argparse
+import io
+import json
+
+from pydantic import ValidationError
+from sqlalchemy import insert, or_, update
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+import crud
+import models
+import schemas
+import search
+from catalog_cache import catalog_cache
+
+DEFAULT_BATCH_SIZE = 500
+MAX_REPORTED_ERRORS = 100
+_READ_SIZE = 64 * 1024
+
+
+class ImportFormatError(ValueError):
+    pass
+
+
+def _iter_json_array(text, buf: str):
+    """Yield the elements of a top-level JSON array without loading all of it."""
+    decoder = json.JSONDecoder()
+    pos = buf.index("[") + 1
+    eof = False
+
+    while True:
+        # skip separators, pulling more text when the buffer runs dry
+        while True:
+            while pos < len(buf) and buf[pos] in " \t\r\n,":
+                pos += 1
+            if pos < len(buf) or eof:
+                break
+            chunk = text.read(_READ_SIZE)
+            eof = not chunk
+            buf, pos = buf[pos:] + chunk, 0
+
+        if pos >= len(buf):
+            raise ImportFormatError("Unexpected end of file inside JSON array")
+        if buf[pos] == "]":
+            return
+
+        try:
+            value, end = decoder.raw_decode(buf, pos)
+            complete = end < len(buf) or eof
+        except json.JSONDecodeError:
+            if eof:
+                raise ImportFormatError(f"Invalid JSON near offset {pos}")
+            complete = False
+
+        if not complete:
+            chunk = text.read(_READ_SIZE)
+            eof = not chunk
+            buf, pos = buf[pos:] + chunk, 0
+            continue
+
+        yield value
+        pos = end
+
+
+def iter_records(stream):
+    """
+    Yield (row number, record) from a binary or text stream.
+
+    The format is detected from the first non-blank character: "[" means
+    a JSON array, anything else is read as NDJSON (one object per line).
+    NDJSON lines that are not valid JSON are yielded as an exception
+    instead of a record, so the caller can report them and keep going.
+    """
+    text = io.TextIOWrapper(stream, encoding="utf-8") if not isinstance(stream, io.TextIOBase) else stream
+
+    buf = ""
+    while not buf.strip():
+        chunk = text.read(_READ_SIZE)
+        if not chunk:
+            return
+        buf += chunk
+
+    if buf.lstrip()[0] == "[":
+        for row, record in enumerate(_iter_json_array(text, buf), start=1):
+            yield row, record
+        return
+
+    lines = io.StringIO(buf)
+    row = 0
+    pending = ""
+    while True:
+        for line in lines:
+            if not line.endswith("\n"):
+                pending = line
+                break
+            if line.strip():
+                row += 1
+                try:
+                    yield row, json.loads(line)
+                except json.JSONDecodeError as exc:
+                    yield row, exc
+        chunk = text.read(_READ_SIZE)
+        if not chunk:
+            break
+        lines = io.StringIO(pending + chunk)
+        pending = ""
+
+    if pending.strip():
+        row += 1
+        try:
+            yield row, json.loads(pending)
+        except json.JSONDecodeError as exc:
+            yield row, exc
+
+
+def _write_batch(db: Session, batch: list):
+    """Upsert one batch of (row, product_id or None, ProductCreate). Returns (inserted, updated)."""
+    # Last occurrence wins when a batch mentions the same product twice
+    by_key = {}
+    for row, product_id, product in batch:
+        by_key[("id", product_id) if product_id is not None else ("name", product.name)] = product
+
+    ids = [value for kind, value in by_key if kind == "id"]
+    names = [value for kind, value in by_key if kind == "name"]
+    existing_ids = set()
+    name_to_id = {}
+    if ids or names:
+        found = db.query(models.Product.id, models.Product.name).filter(
+            or_(models.Product.id.in_(ids), models.Product.name.in_(names))
+        ).order_by(models.Product.id.desc())
+        for product_id, name in found:
+            existing_ids.add(product_id)
+            name_to_id[name] = product_id   # lowest id wins for duplicate names
+
+    # Updates only write the fields the record set; inserts get the defaults too
+    to_insert, to_update = [], []
+    for (kind, value), product in by_key.items():
+        if kind == "id" and value in existing_ids:
+            to_update.append(product.model_dump(exclude_unset=True) | {"id": value})
+        elif kind == "id":
+            to_insert.append(product.model_dump() | {"id": value})
+        elif value in name_to_id:
+            to_update.append(product.model_dump(exclude_unset=True) | {"id": name_to_id[value]})
+        else:
+            to_insert.append(product.model_dump())
+
+    touched = [data["id"] for data in to_update]
+    if to_update:
+        db.execute(update(models.Product), to_update)
+    if to_insert:
+        # Unordered RETURNING keeps this one statement on SQLite; the ids only feed the reindex
+        inserted = db.execute(insert(models.Product).returning(models.Product.id), to_insert)
+        touched += list(inserted.scalars())
+
+    search.reindex_products(db, touched)
+    crud.bump_stats(db, {"products": len(to_insert)})
+    db.commit()
+    return len(to_insert), len(to_update)
+
+
+def import_products(db: Session, stream, batch_size: int = DEFAULT_BATCH_SIZE) -> dict:
+    """Import every record in `stream` and return a per-row report."""
+    report = {"inserted": 0, "updated": 0, "failed": 0, "errors": []}
+
+    def fail(row, error):
+        report["failed"] += 1
+        if len(report["errors"]) < MAX_REPORTED_ERRORS:
+            report["errors"].append({"row": row, "error": error})
+
+    def write(batch):
+        try:
+            inserted, updated = _write_batch(db, batch)
+        except SQLAlchemyError as exc:
+            db.rollback()
+            error = f"Database error: {getattr(exc, 'orig', None) or exc}"
+            for row, _, _ in batch:
+                fail(row, error)
+            return
+        report["inserted"] += inserted
+        report["updated"] += updated
+
+    batch = []
+    try:
+        for row, record in iter_records(stream):
+            if isinstance(record, Exception):
+                fail(row, f"Invalid JSON: {record}")
+                continue
+            if not isinstance(record, dict):
+                fail(row, "Expected a JSON object")
+                continue
+
+            product_id = record.get("id")
+            if product_id is not None and (isinstance(product_id, bool) or not isinstance(product_id, int)):
+                fail(row, "id must be an integer")
+                continue
+            try:
+                product = schemas.ProductCreate.model_validate(record)
+            except ValidationError as exc:
+                fail(row, "; ".join(
+                    f"{'.'.join(map(str, e['loc']))}: {e['msg']}" for e in exc.errors()
+                ))
+                continue
+
+            batch.append((row, product_id, product))
+            if len(batch) >= batch_size:
+                write(batch)
+                batch = []
+        if batch:
+            write(batch)
+    except (ImportFormatError, UnicodeDecodeError) as exc:
+        fail(None, str(exc))
+        if batch:
+            write(batch)
+    finally:
+        # Committed batches are visible even if a later one blew up
+        if report["inserted"] or report["updated"]:
+            catalog_cache.invalidate_all()
+    return report
+
+
+def main(argv=None):
+    from database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Bulk import products from JSON or NDJSON")
+    parser.add_argument("path", help="JSON array or NDJSON file")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    args = parser.parse_args(argv)
+
+    db = SessionLocal()
+    try:
+        with open(args.path, "rb") as stream:
+            report = import_products(db, stream, args.batch_size)
+    finally:
+        db.close()
+    print(json.dumps(report, indent=2))
+    return 1 if report["failed"] else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
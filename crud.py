@@ -1,7 +1,14 @@
 # crud.py
+from datetime import datetime
 from fastapi import HTTPException
+from sqlalchemy import delete, func, insert, update
 from sqlalchemy.orm import Session
 import models, schemas, auth
+import search
+import reservations
+import jobs
+import principals
+from catalog_cache import catalog_cache
 
 # ---------- USER ----------
 def get_user_by_email(db: Session, email: str):
@@ -10,28 +17,36 @@ def get_user_by_email(db: Session, email: str):
 def get_user(db: Session, user_id: int):
     return db.query(models.User).filter(models.User.id == user_id).first()
 
-def create_user(db: Session, user: schemas.UserCreate):
-    hashed = auth.get_password_hash(user.password)
+def create_user(db: Session, user: schemas.UserCreate, hashed_password: str | None = None):
+    hashed = hashed_password or auth.get_password_hash(user.password)
     db_user = models.User(email=user.email, hashed_password=hashed, is_admin=user.is_admin)
     db.add(db_user)
+    bump_stats(db, {"users": 1})
     db.commit()
     db.refresh(db_user)
     return db_user
 
-def authenticate_user(db: Session, email: str, password: str):
-    user = get_user_by_email(db, email)
-    if not user:
-        return None
-    if not auth.verify_password(password, user.hashed_password):
-        return None
+def update_password_hash(db: Session, user: models.User, hashed_password: str):
+    user.hashed_password = hashed_password
+    db.commit()
+    principals.principal_cache.invalidate(user.email)
     return user
 
+def set_user_active(db: Session, user: models.User, active: bool):
+    user.is_active = 1 if active else 0
+    db.commit()
+    db.refresh(user)
+    principals.principal_cache.invalidate(user.email)
+    return user
 
 # ---------------- PRODUCT CRUD ---------------- #
 
 def create_product(db: Session, product_data):
     product = models.Product(**product_data.model_dump())
     db.add(product)
+    db.flush()
+    search.index_product(db, product)
+    bump_stats(db, {"products": 1})
     db.commit()
     db.refresh(product)
     return product
@@ -49,7 +64,8 @@ def update_product(db: Session, product_id: int, product_data):
 
     for key, value in product_data.model_dump().items():
         setattr(product, key, value)
-    
+
+    search.index_product(db, product)
     db.commit()
     db.refresh(product)
     return product
@@ -60,6 +76,8 @@ def delete_product(db: Session, product_id: int):
         return None
 
     db.delete(product)
+    search.unindex_product(db, product_id)
+    bump_stats(db, {"products": -1})
     db.commit()
     return True
 
@@ -79,29 +97,35 @@ def get_cart_item(db: Session, user_id: int, product_id: int):
 
 
 def add_to_cart(db: Session, user_id: int, product_id: int, quantity: int):
-    item = get_cart_item(db, user_id, product_id)
-
-    if item:
-        item.quantity += quantity
-    else:
-        item = models.Cart(
-            user_id=user_id,
-            product_id=product_id,
-            quantity=quantity
-        )
-        db.add(item)
-
+    """
+    Insert the cart line or add to its quantity in one upsert on (user_id, product_id),
+    and hold the stock for it (see reservations.py).
+    """
+    stmt = _dialect_insert(db)(models.Cart).values(
+        user_id=user_id, product_id=product_id, quantity=quantity
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[models.Cart.user_id, models.Cart.product_id],
+        set_={"quantity": models.Cart.quantity + stmt.excluded.quantity},
+    )
+    item = db.scalars(
+        stmt.returning(models.Cart), execution_options={"populate_existing": True}
+    ).one()
+    reservations.hold(db, user_id, {product_id: item.quantity})
     db.commit()
-    db.refresh(item)
     return item
 
 
 def update_cart_quantity(db: Session, user_id: int, product_id: int, quantity: int):
+    """Set a line's quantity and its hold; 0 removes the line."""
     item = get_cart_item(db, user_id, product_id)
     if not item:
         return None
 
     item.quantity = quantity
+    if quantity == 0:
+        db.delete(item)
+    reservations.hold(db, user_id, {product_id: quantity})
     db.commit()
     return item
 
@@ -112,17 +136,93 @@ def remove_from_cart(db: Session, user_id: int, product_id: int):
         return False
 
     db.delete(item)
+    reservations.release(db, user_id, [product_id])
     db.commit()
     return True
 
+def apply_cart_batch(db: Session, user_id: int, operations):
+    """
+    Apply add / set / remove operations to a cart in one transaction.
+
+    All product ids are checked with one query before anything is written;
+    an unknown product rejects the whole batch. The writes themselves are at
+    most one delete and two upserts, however many operations there are.
+    """
+    wanted = {op.product_id for op in operations if op.op != "remove"}
+    known = {
+        pid for (pid,) in
+        db.query(models.Product.id).filter(models.Product.id.in_(wanted))
+    }
+    missing = sorted(wanted - known)
+    if missing:
+        raise HTTPException(404, f"Products do not exist: {missing}")
+
+    # Fold the operations into one final change per product:
+    # ("add", n) adds to whatever is there, ("set", n) replaces it, None removes the line.
+    changes = {}
+    for op in operations:
+        current = changes.get(op.product_id, ("add", 0))
+        if op.op == "remove" or (op.op == "set" and op.quantity == 0):
+            changes[op.product_id] = None
+        elif op.op == "set":
+            changes[op.product_id] = ("set", op.quantity)
+        elif current is None:
+            changes[op.product_id] = ("set", op.quantity)
+        else:
+            changes[op.product_id] = (current[0], current[1] + op.quantity)
+
+    removed = [pid for pid, change in changes.items() if change is None]
+    if removed:
+        db.execute(
+            delete(models.Cart)
+            .where(models.Cart.user_id == user_id, models.Cart.product_id.in_(removed))
+            .execution_options(synchronize_session=False)
+        )
+
+    # One upsert per kind of change on the (user_id, product_id) unique index
+    upsert = _dialect_insert(db)
+    for kind in ("add", "set"):
+        rows = [
+            {"user_id": user_id, "product_id": pid, "quantity": change[1]}
+            for pid, change in changes.items()
+            if change is not None and change[0] == kind and (kind == "set" or change[1])
+        ]
+        if not rows:
+            continue
+        stmt = upsert(models.Cart).values(rows)
+        quantity = stmt.excluded.quantity
+        if kind == "add":
+            quantity = models.Cart.quantity + quantity
+        db.execute(stmt.on_conflict_do_update(
+            index_elements=[models.Cart.user_id, models.Cart.product_id],
+            set_={"quantity": quantity},
+        ))
+
+    # Re-hold stock for every product the batch touched
+    final = dict(
+        db.query(models.Cart.product_id, models.Cart.quantity).filter(
+            models.Cart.user_id == user_id, models.Cart.product_id.in_(changes)
+        )
+    )
+    reservations.hold(db, user_id, {pid: final.get(pid, 0) for pid in changes})
+
+    db.commit()
+    return get_cart_items(db, user_id)
+
+
 #---------------- ORDER CRUD ---------------- #
 def log_status(db, order_id, status):
-    history = models.OrderStatusHistory(order_id=order_id, status=status)
-    db.add(history)
-    db.commit()
+    """Queue an order status history entry (written by jobs.py). Does not commit."""
+    jobs.enqueue(db, "order_status", {
+        "order_id": order_id, "status": status, "at": datetime.now().isoformat(),
+    })
 
 
 def create_order_from_cart(db: Session, user_id: int):
+    """
+    Checkout as a single unit of work: every statement below runs in one
+    transaction and is committed once at the end, or rolled back entirely.
+    """
     # Fetch user cart items
     cart_items = db.query(models.Cart).filter(models.Cart.user_id == user_id).all()
     if not cart_items:
@@ -138,7 +238,14 @@ def create_order_from_cart(db: Session, user_id: int):
     if not primary_addr:
         raise HTTPException(400, "Please set a primary address before ordering.")
 
-    # 2️⃣ Create order with shipping details
+    # 2️⃣ Load every product in the cart with one IN (...) query
+    product_ids = {item.product_id for item in cart_items}
+    products = {
+        p.id: p
+        for p in db.query(models.Product).filter(models.Product.id.in_(product_ids))
+    }
+
+    # 3️⃣ Create order with shipping details (flush only, to get the id)
     order = models.Order(
         user_id=user_id,
         status="Pending",
@@ -149,48 +256,73 @@ def create_order_from_cart(db: Session, user_id: int):
         shipping_state=primary_addr.state,
         shipping_pincode=primary_addr.pincode
     )
-
-    log_status(db, order.id, "Pending")
-
     db.add(order)
-    db.commit()
-    db.refresh(order)
+    db.flush()
 
     total = 0
-
-    # 3️⃣ Create order items + subtract stock
-    for item in cart_items:
-        product = db.query(models.Product).filter(models.Product.id == item.product_id).first()
-
-        if not product:
-            continue
-
-        if product.stock < item.quantity:
-            raise HTTPException(400, f"Not enough stock for {product.name}")
-
-        # Order item
-        order_item = models.OrderItem(
-            order_id=order.id,
-            product_id=item.product_id,
-            quantity=item.quantity,
-            price=product.price
+    order_items = []
+
+    try:
+        # 4️⃣ Consume this shopper's holds and subtract stock with guarded
+        # updates. Units held for the shopper count as available to them;
+        # a zero rowcount means the rest was taken by other carts first.
+        # A fully held line only needs physical stock, so after stock is
+        # written down below what is held, holders compete for what is left.
+        held = reservations.take(db, user_id)
+        for item in cart_items:
+            product = products.get(item.product_id)
+            if not product:
+                continue
+
+            own = held.pop(product.id, 0)
+            guards = [models.Product.stock >= item.quantity]
+            if own < item.quantity:
+                guards.append(models.Product.stock - models.Product.reserved + own >= item.quantity)
+            result = db.execute(
+                update(models.Product)
+                .where(models.Product.id == product.id, *guards)
+                .values(
+                    stock=models.Product.stock - item.quantity,
+                    reserved=models.Product.reserved - own,
+                )
+                .execution_options(synchronize_session=False)
+            )
+            if result.rowcount != 1:
+                raise HTTPException(400, f"Not enough stock for {product.name}")
+
+            order_items.append({
+                "order_id": order.id,
+                "product_id": product.id,
+                "quantity": item.quantity,
+                "price": product.price,
+            })
+            total += product.price * item.quantity
+
+        # Holds for products that no longer exist in the catalog
+        reservations.unreserve(db, held)
+
+        # 5️⃣ Bulk insert order items
+        if order_items:
+            db.execute(insert(models.OrderItem), order_items)
+
+        # 6️⃣ Save total, queue the status history entry and clear cart
+        order.total_amount = total
+        log_status(db, order.id, "Pending")
+        bump_stats(db, {"orders": 1, "revenue:Pending": total})
+        db.query(models.Cart).filter(models.Cart.user_id == user_id).delete(
+            synchronize_session=False
         )
-        db.add(order_item)
 
-        # Subtract stock
-        product.stock -= item.quantity
         db.commit()
+    except Exception:
+        db.rollback()
+        raise
 
-        total += product.price * item.quantity
-
-    # 4️⃣ Save total
-    order.total_amount = total
-    db.commit()
-
-    # 5️⃣ Clear cart
-    db.query(models.Cart).filter(models.Cart.user_id == user_id).delete()
-    db.commit()
+    # Stock changed, so cached product JSON for these ids is stale
+    for item in order_items:
+        catalog_cache.invalidate_product(item["product_id"], membership_changed=False)
 
+    db.refresh(order)
     return order
 
 
@@ -216,66 +348,53 @@ def get_product_images(db, product_id: int):
     return db.query(models.ProductImage).filter(models.ProductImage.product_id==product_id).all()
 
 
-# ---------------- ADDRESS CRUD ---------------- #
-
-def list_addresses(db, user_id: int):
-    return db.query(models.Address).filter(models.Address.user_id == user_id).all()
-
-
-def create_address(db, user_id: int, data):
-    # If new address is primary → set all others to false
-    if data.is_primary:
-        db.query(models.Address).filter(models.Address.user_id == user_id).update(
-            {"is_primary": False}
-        )
-    address = models.Address(
-        user_id=user_id,
-        full_name=data.full_name,
-        phone=data.phone,
-        street=data.street,
-        city=data.city,
-        state=data.state,
-        pincode=data.pincode,
-        landmark=data.landmark,
-        country=data.country,
-        is_primary=data.is_primary,
-    )
-
-       
-    db.add(address)
-    db.commit()
-    db.refresh(address)
-    return address
+# ---------------- STATS ROLLUP ---------------- #
 
+def _dialect_insert(db: Session):
+    if db.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    return dialect_insert
 
-def set_primary_address(db: Session, user_id: int, address_id: int):
-    addr = db.query(models.Address).filter(
-        models.Address.id == address_id,
-        models.Address.user_id == user_id
-    ).first()
 
-    if not addr:
+def stats_upsert(db, deltas: dict):
+    """The upsert adding `deltas` to the named counters, or None when there is nothing to add."""
+    deltas = {name: delta for name, delta in deltas.items() if delta}
+    if not deltas:
         return None
 
-    # Reset others
-    db.query(models.Address).filter(
-        models.Address.user_id == user_id
-    ).update({"is_primary": False})
-
-    addr.is_primary = True
-    db.commit()
-    return addr
-
+    stmt = _dialect_insert(db)(models.StatCounter).values(
+        [{"name": name, "value": delta} for name, delta in deltas.items()]
+    )
+    return stmt.on_conflict_do_update(
+        index_elements=[models.StatCounter.name],
+        set_={"value": models.StatCounter.value + stmt.excluded.value},
+    )
 
-def delete_address(db, user_id: int, address_id: int):
-    address = db.query(models.Address).filter(
-        models.Address.id == address_id,
-        models.Address.user_id == user_id
-    ).first()
 
-    if not address:
-        return False
+def bump_stats(db: Session, deltas: dict):
+    """Add `deltas` to the named counters in one upsert. Does not commit."""
+    stmt = stats_upsert(db, deltas)
+    if stmt is not None:
+        db.execute(stmt)
+
+
+def rebuild_stats(db: Session):
+    """Recompute every counter from the base tables, e.g. after a manual data fix."""
+    counters = {
+        "users": db.query(func.count(models.User.id)).scalar(),
+        "products": db.query(func.count(models.Product.id)).scalar(),
+        "orders": db.query(func.count(models.Order.id)).scalar(),
+    }
+    revenue = (
+        db.query(models.Order.status, func.coalesce(func.sum(models.Order.total_amount), 0))
+        .group_by(models.Order.status)
+        .all()
+    )
+    for status, amount in revenue:
+        counters[f"revenue:{status}"] = amount
 
-    db.delete(address)
+    db.query(models.StatCounter).delete()
+    db.add_all(models.StatCounter(name=name, value=value) for name, value in counters.items())
     db.commit()
-    return True
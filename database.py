@@ -1,21 +1,134 @@
-# database.py
 """
 This sets up SQLAlchemy + SQLite.
 
-"""
+Two engines point at the same database: the blocking `engine` used by
+`get_db`, and `async_engine` (aiosqlite) used by `get_async_db` for
+handlers that run directly on the event loop.
+
+Everything is configured from the environment:
 
+    DATABASE_URL            sync SQLAlchemy URL (default sqlite:///./ecommerce.db)
+    ASYNC_DATABASE_URL      async URL (default: derived from DATABASE_URL)
+    DB_POOL_SIZE            pooled connections per engine (default 10)
+    DB_MAX_OVERFLOW         extra connections under burst (default 20)
+    DB_POOL_RECYCLE         seconds before a connection is replaced (default 1800)
+    DB_ECHO                 "1" to log every statement
+    SQLITE_JOURNAL_MODE     default WAL, so readers do not block behind writers
+    SQLITE_SYNCHRONOUS      default NORMAL (safe with WAL, far fewer fsyncs)
+    SQLITE_BUSY_TIMEOUT_MS  wait for a lock instead of failing (default 5000)
+    SQLITE_CACHE_SIZE_KB    page cache per connection (default 65536)
+    SQLITE_MMAP_SIZE        bytes of the file to memory-map (default 256 MiB)
+"""
+import logging
+import os
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
 
-DATABASE_URL = "sqlite:///./ecommerce.db"
+logger = logging.getLogger(__name__)
+
+_ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "mysql": "mysql+aiomysql",
+}
+
+
+def _async_url(url: str) -> str:
+    parsed = make_url(url)
+    driver = _ASYNC_DRIVERS.get(parsed.get_backend_name())
+    if driver is None:
+        return url
+    return parsed.set(drivername=driver).render_as_string(hide_password=False)
+
+
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./ecommerce.db")
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or _async_url(DATABASE_URL)
+
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_ECHO = os.getenv("DB_ECHO", "0") == "1"
+
+SQLITE_PRAGMAS = {
+    "journal_mode": os.getenv("SQLITE_JOURNAL_MODE", "WAL"),
+    "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+    "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000")),
+    # negative cache_size is in KiB rather than pages
+    "cache_size": -int(os.getenv("SQLITE_CACHE_SIZE_KB", "65536")),
+    "mmap_size": int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))),
+}
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in SQLITE_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+    finally:
+        cursor.close()
+
 
-engine = create_engine(
-    DATABASE_URL, connect_args={"check_same_thread": False}
-)
+def _engine_options(url) -> dict:
+    options = {"echo": DB_ECHO, "pool_pre_ping": True, "pool_recycle": DB_POOL_RECYCLE}
+
+    if url.get_backend_name() == "sqlite":
+        options["connect_args"] = {
+            "check_same_thread": False,
+            "timeout": SQLITE_PRAGMAS["busy_timeout"] / 1000,
+        }
+        if url.database in (None, "", ":memory:"):
+            # in-memory databases cannot be pooled across connections
+            return options
+
+    options["pool_size"] = DB_POOL_SIZE
+    options["max_overflow"] = DB_MAX_OVERFLOW
+    return options
+
+
+def create_db_engine(url: str = DATABASE_URL):
+    """Build the blocking engine, with SQLite pragmas applied on every new connection."""
+    parsed = make_url(url)
+    db_engine = create_engine(parsed, **_engine_options(parsed))
+    if parsed.get_backend_name() == "sqlite":
+        event.listen(db_engine, "connect", _set_sqlite_pragmas)
+    return db_engine
+
+
+def create_async_db_engine(url: str = ASYNC_DATABASE_URL):
+    """Async twin of create_db_engine."""
+    parsed = make_url(url)
+    db_engine = create_async_engine(parsed, **_engine_options(parsed))
+    if parsed.get_backend_name() == "sqlite":
+        event.listen(db_engine.sync_engine, "connect", _set_sqlite_pragmas)
+    return db_engine
+
+
+def log_engine_settings(db_engine):
+    """Log the URL, pool and (for SQLite) the pragmas as the database reports them."""
+    settings = {
+        "url": db_engine.url.render_as_string(hide_password=True),
+        "pool": db_engine.pool.status(),
+        "pool_recycle": DB_POOL_RECYCLE,
+    }
+    if db_engine.dialect.name == "sqlite":
+        with db_engine.connect() as conn:
+            for name in SQLITE_PRAGMAS:
+                settings[name] = conn.exec_driver_sql(f"PRAGMA {name}").scalar()
+    logger.info("Database engine settings: %s", settings)
+    return settings
+
+
+engine = create_db_engine()
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+async_engine = create_async_db_engine()
+
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 Base = declarative_base()
 
 def get_db():
@@ -23,4 +136,8 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
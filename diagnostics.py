@@ -0,0 +1,132 @@
+"""
+Query diagnostics hooked into SQLAlchemy engine events.
+
+* Slow-query log: statements slower than SLOW_QUERY_MS are logged with
+  their bound parameters.
+* N+1 detector: within one request, the same statement shape executed
+  N_PLUS_ONE_THRESHOLD times or more is reported with the route name.
+* Query plans: with EXPLAIN_SLOW_QUERIES=1, slow SELECTs are followed
+  by EXPLAIN QUERY PLAN and the plan is logged with them.
+* Query budgets for tests: `with query_budget(3): client.get(...)`
+  fails the test if the block runs more statements than allowed.
+"""
+import logging
+import os
+import re
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+import query_timing
+
+logger = logging.getLogger("diagnostics")
+
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+N_PLUS_ONE_THRESHOLD = int(os.getenv("N_PLUS_ONE_THRESHOLD", "5"))
+EXPLAIN_SLOW_QUERIES = os.getenv("EXPLAIN_SLOW_QUERIES", "0") == "1"
+
+_PARAMS_PREVIEW = 500
+_IN_LIST = re.compile(r"\((?:\s*\?\s*,)+\s*\?\s*\)")
+_SPACES = re.compile(r"\s+")
+
+_shapes = ContextVar("statement_shapes", default=None)
+
+
+def statement_shape(statement: str) -> str:
+    """Normalize a statement so repeats differing only in IN-list length compare equal."""
+    return _IN_LIST.sub("(?)", _SPACES.sub(" ", statement).strip())
+
+
+# ---------------- PER-REQUEST N+1 DETECTION ---------------- #
+
+def begin_request():
+    _shapes.set(Counter())
+
+
+def end_request(label: str):
+    """Report repeated statement shapes for the request that just finished."""
+    shapes = _shapes.get()
+    _shapes.set(None)
+    if not shapes:
+        return []
+    repeated = [(shape, n) for shape, n in shapes.items() if n >= N_PLUS_ONE_THRESHOLD]
+    for shape, n in repeated:
+        logger.warning("Possible N+1 in %s: %d x %s", label, n, shape)
+    return repeated
+
+
+# ---------------- ENGINE EVENTS ---------------- #
+
+def _explain(conn, statement, parameters):
+    prefix = "EXPLAIN QUERY PLAN " if conn.dialect.name == "sqlite" else "EXPLAIN "
+    cursor = conn.connection.cursor()
+    try:
+        cursor.execute(prefix + statement, parameters)
+        return [tuple(row) for row in cursor.fetchall()]
+    except Exception as exc:     # diagnostics must never break the query itself
+        return [f"EXPLAIN failed: {exc}"]
+    finally:
+        cursor.close()
+
+
+def _check_statement(conn, statement, parameters, executemany, seconds):
+    elapsed_ms = seconds * 1000
+
+    shapes = _shapes.get()
+    if shapes is not None:
+        shapes[statement_shape(statement)] += 1
+
+    if elapsed_ms < SLOW_QUERY_MS:
+        return
+
+    params = repr(parameters)
+    if len(params) > _PARAMS_PREVIEW:
+        params = params[:_PARAMS_PREVIEW] + "..."
+    plan = None
+    if EXPLAIN_SLOW_QUERIES and not executemany and statement.lstrip().upper().startswith("SELECT"):
+        plan = _explain(conn, statement, parameters)
+    logger.warning(
+        "Slow query (%.1f ms): %s | params=%s%s",
+        elapsed_ms,
+        _SPACES.sub(" ", statement).strip(),
+        params,
+        f" | plan={plan}" if plan is not None else "",
+    )
+
+
+def instrument_engine(engine):
+    """Attach the slow-query log and N+1 counters to a (sync) Engine; safe to call twice."""
+    query_timing.on_statement(_check_statement)
+    query_timing.instrument_engine(engine)
+
+
+# ---------------- TEST HELPERS ---------------- #
+
+@contextmanager
+def capture_statements(target=Engine):
+    """Collect every statement executed on `target` (default: all engines) inside the block."""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(target, "before_cursor_execute", record)
+    try:
+        yield statements
+    finally:
+        event.remove(target, "before_cursor_execute", record)
+
+
+@contextmanager
+def query_budget(max_statements: int, target=Engine):
+    """Fail with the offending statements if the block executes more than `max_statements`."""
+    with capture_statements(target) as statements:
+        yield statements
+    if len(statements) > max_statements:
+        listing = "\n".join(f"  {i}. {statement_shape(s)}" for i, s in enumerate(statements, 1))
+        raise AssertionError(
+            f"Query budget exceeded: {len(statements)} statements, budget {max_statements}\n{listing}"
+        )
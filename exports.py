@@ -0,0 +1,114 @@
+"""
+Streaming exports of products, orders (with their items) and users.
+
+Rows are fetched with yield_per, so only one batch is in memory at a time,
+and written out as NDJSON or CSV through a StreamingResponse while they are
+read. Each export opens its own session on the request's engine because
+the response body is produced after the handler has returned.
+"""
+import csv
+import io
+import json
+
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.orm import Session, selectinload
+
+import models
+
+EXPORT_BATCH_SIZE = 1000
+_CSV_FLUSH_ROWS = 200
+
+PRODUCT_FIELDS = ["id", "name", "description", "price", "stock", "reserved", "is_active"]
+USER_FIELDS = ["id", "email", "is_active", "is_admin"]
+ORDER_FIELDS = [
+    "id", "user_id", "status", "total_amount", "created_at", "paid_at", "refunded_at",
+    "shipping_name", "shipping_phone", "shipping_address", "shipping_city",
+    "shipping_state", "shipping_pincode",
+]
+ORDER_ITEM_FIELDS = ["product_id", "quantity", "price"]
+
+
+def _iter_columns(bind, model, fields):
+    columns = [getattr(model, name) for name in fields]
+    with Session(bind) as db:
+        result = db.execute(
+            select(*columns).order_by(model.id).execution_options(yield_per=EXPORT_BATCH_SIZE)
+        )
+        for row in result.mappings():
+            yield dict(row)
+
+
+def iter_products(bind):
+    return _iter_columns(bind, models.Product, PRODUCT_FIELDS)
+
+
+def iter_users(bind):
+    return _iter_columns(bind, models.User, USER_FIELDS)
+
+
+def iter_orders(bind):
+    with Session(bind) as db:
+        orders = (
+            db.query(models.Order)
+            .options(selectinload(models.Order.items))
+            .order_by(models.Order.id)
+            .yield_per(EXPORT_BATCH_SIZE)
+        )
+        for order in orders:
+            record = {name: getattr(order, name) for name in ORDER_FIELDS}
+            record["items"] = [
+                {name: getattr(item, name) for name in ORDER_ITEM_FIELDS} for item in order.items
+            ]
+            yield record
+
+
+def _flatten_orders(records):
+    """One CSV row per order item, with the order columns repeated."""
+    for record in records:
+        items = record.pop("items") or [dict.fromkeys(ORDER_ITEM_FIELDS)]
+        for item in items:
+            yield record | {f"item_{name}": value for name, value in item.items()}
+
+
+def to_ndjson(records):
+    for record in records:
+        yield json.dumps(record, default=str) + "\n"
+
+
+def to_csv(records, fields):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fields)
+    writer.writeheader()
+    for count, record in enumerate(records, start=1):
+        writer.writerow(record)
+        if count % _CSV_FLUSH_ROWS == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+DATASETS = {
+    "products": (iter_products, PRODUCT_FIELDS),
+    "users": (iter_users, USER_FIELDS),
+    "orders": (iter_orders, ORDER_FIELDS + [f"item_{name}" for name in ORDER_ITEM_FIELDS]),
+}
+
+
+def stream_export(bind, dataset: str, fmt: str) -> StreamingResponse:
+    iter_records, csv_fields = DATASETS[dataset]
+    records = iter_records(bind)
+
+    if fmt == "csv":
+        if dataset == "orders":
+            records = _flatten_orders(records)
+        body, media_type = to_csv(records, csv_fields), "text/csv"
+    else:
+        body, media_type = to_ndjson(records), "application/x-ndjson"
+
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{dataset}.{fmt}"'},
+    )
@@ -0,0 +1,44 @@
+"""
+Sparse fieldsets: `?fields=id,status,total_amount` on read endpoints.
+
+`parse_fields` validates the requested names against a response schema and
+`partial_schema` builds (and caches) a schema with only those fields. The
+partial schema reads just the requested attributes, so relationships that
+were not asked for are never touched and need not be loaded.
+"""
+from functools import lru_cache
+
+from fastapi import HTTPException
+from pydantic import BaseModel, ConfigDict, create_model
+
+
+def parse_fields(fields: str | None, schema: type[BaseModel]) -> frozenset | None:
+    """Comma separated names -> frozenset (always including "id"), or None for all fields."""
+    if not fields:
+        return None
+    wanted = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = sorted(wanted - schema.model_fields.keys())
+    if unknown:
+        raise HTTPException(
+            400, f"Unknown fields: {unknown}. Allowed: {sorted(schema.model_fields)}"
+        )
+    return frozenset(wanted | ({"id"} & schema.model_fields.keys()))
+
+
+@lru_cache(maxsize=256)
+def partial_schema(schema: type[BaseModel], fields: frozenset | None) -> type[BaseModel]:
+    if fields is None:
+        return schema
+    return create_model(
+        f"{schema.__name__}Fields",
+        __config__=ConfigDict(from_attributes=True),
+        **{
+            name: (info.annotation, info)
+            for name, info in schema.model_fields.items()
+            if name in fields
+        },
+    )
+
+
+def wants(fields: frozenset | None, name: str) -> bool:
+    return fields is None or name in fields
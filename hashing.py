@@ -0,0 +1,118 @@
+"""
+Password hashing off the request threads.
+
+bcrypt is slow on purpose. Run on the request threadpool, a burst of
+logins takes every worker thread and starves cheap catalog reads. So
+hashes are computed in a small process pool instead. In-flight work is
+capped by HASH_QUEUE_LIMIT, and past that a request fails fast with
+503 instead of queueing without bound.
+
+The cost factor comes from BCRYPT_ROUNDS. A stored hash made with a lower
+cost is re-hashed the next time its owner logs in successfully.
+"""
+import asyncio
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from fastapi import HTTPException
+from passlib.context import CryptContext
+
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+HASH_QUEUE_LIMIT = int(os.getenv("HASH_QUEUE_LIMIT", "64"))
+
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+)
+
+
+def _hash(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def _verify(password: str, hashed: str) -> bool:
+    return pwd_context.verify(password, hashed)
+
+
+def needs_rehash(hashed: str) -> bool:
+    """True when `hashed` uses a deprecated scheme or a lower cost than BCRYPT_ROUNDS."""
+    return pwd_context.needs_update(hashed)
+
+
+class HashingPool:
+    def __init__(self, workers: int = HASH_WORKERS, queue_limit: int = HASH_QUEUE_LIMIT):
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self._executor = None
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+    def _get_executor(self):
+        if self._executor is None:
+            # spawn, not fork: the API process is multi-threaded
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._executor
+
+    async def run(self, fn, *args):
+        with self._lock:
+            if self.in_flight >= self.queue_limit:
+                self.rejected += 1
+                raise HTTPException(
+                    503, "Too many concurrent logins, please retry", headers={"Retry-After": "1"}
+                )
+            self.in_flight += 1
+            executor = self._get_executor()
+
+        started = time.perf_counter()
+        try:
+            return await asyncio.wrap_future(executor.submit(fn, *args))
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self.in_flight -= 1
+                self.completed += 1
+                self.total_seconds += elapsed
+                self.max_seconds = max(self.max_seconds, elapsed)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "bcrypt_rounds": BCRYPT_ROUNDS,
+                "queue_limit": self.queue_limit,
+                "queue_depth": self.in_flight,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "avg_latency_ms": round(1000 * self.total_seconds / self.completed, 2) if self.completed else 0.0,
+                "max_latency_ms": round(1000 * self.max_seconds, 2),
+            }
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True, cancel_futures=True)
+                self._executor = None
+
+
+hashing_pool = HashingPool()
+
+
+async def hash_password(password: str) -> str:
+    return await hashing_pool.run(_hash, password)
+
+
+async def verify_password(password: str, hashed: str) -> bool:
+    return await hashing_pool.run(_verify, password, hashed)
@@ -0,0 +1,244 @@
+"""
+Durable background jobs backed by the `jobs` table.
+
+Request handlers call `enqueue(db, kind, payload)` before their commit, so
+the job is stored atomically with the change that caused it, and the
+request returns without running the side effect. Workers started from the
+app lifespan claim due jobs in batches of one kind, run the kind's handler
+once per batch in the threadpool, and delete the jobs in the handler's
+transaction.
+
+When a batch fails, its jobs are run again one at a time, so one bad
+payload does not hold back the others. A job that fails on its own is
+retried with exponential backoff. After JOB_MAX_ATTEMPTS tries it is kept
+with status "failed" and its last error. Jobs left "running" by a crashed process are picked up again
+after JOB_LOCK_TIMEOUT. On shutdown the workers drain: they keep working
+until nothing is due, for at most JOB_DRAIN_TIMEOUT seconds.
+
+Handlers are registered with `@handler("kind")` and receive
+`(db, payloads)`. They must not commit; the queue commits for them.
+"""
+import asyncio
+import logging
+import os
+import threading
+from datetime import datetime, timedelta
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import and_, delete, func, insert, or_, select, update
+from sqlalchemy.orm import Session
+
+import models
+
+logger = logging.getLogger(__name__)
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_BATCH_SIZE = int(os.getenv("JOB_BATCH_SIZE", "50"))
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "1"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "5"))
+JOB_RETRY_BASE = float(os.getenv("JOB_RETRY_BASE", "2"))         # seconds, doubled per attempt
+JOB_RETRY_MAX = float(os.getenv("JOB_RETRY_MAX", "300"))
+JOB_LOCK_TIMEOUT = float(os.getenv("JOB_LOCK_TIMEOUT", "300"))
+JOB_DRAIN_TIMEOUT = float(os.getenv("JOB_DRAIN_TIMEOUT", "10"))
+
+HANDLERS = {}
+
+
+def handler(kind: str):
+    def register(fn):
+        HANDLERS[kind] = fn
+        return fn
+    return register
+
+
+def enqueue(db: Session, kind: str, payload: dict, delay: float = 0):
+    """Add a job to the caller's transaction. Does not commit."""
+    if kind not in HANDLERS:
+        raise ValueError(f"No job handler for {kind!r}")
+    db.add(models.Job(
+        kind=kind, payload=payload, status="queued", attempts=0,
+        run_at=datetime.now() + timedelta(seconds=delay),
+    ))
+
+
+def retry_delay(attempts: int) -> float:
+    return min(JOB_RETRY_MAX, JOB_RETRY_BASE * 2 ** (attempts - 1))
+
+
+# ---------------- PROCESSING ---------------- #
+
+def _claim(db: Session, batch_size: int):
+    """Mark up to `batch_size` due jobs of the oldest due kind as running. Returns (kind, rows)."""
+    now = datetime.now()
+    stale = now - timedelta(seconds=JOB_LOCK_TIMEOUT)
+    due = or_(
+        and_(models.Job.status == "queued", models.Job.run_at <= now),
+        and_(models.Job.status == "running", models.Job.locked_at <= stale),
+    )
+    kind = db.scalar(
+        select(models.Job.kind).where(due).order_by(models.Job.run_at, models.Job.id).limit(1)
+    )
+    if kind is None:
+        return None, []
+
+    ids = (
+        select(models.Job.id)
+        .where(due, models.Job.kind == kind)
+        .order_by(models.Job.run_at, models.Job.id)
+        .limit(batch_size)
+    )
+    # The WHERE is repeated so a job claimed by another worker in between is skipped
+    rows = db.execute(
+        update(models.Job)
+        .where(models.Job.id.in_(ids), due)
+        .values(status="running", locked_at=now, attempts=models.Job.attempts + 1)
+        .returning(models.Job.id, models.Job.payload, models.Job.attempts)
+        .execution_options(synchronize_session=False)
+    ).all()
+    db.commit()
+    return kind, rows
+
+
+def _run(db: Session, kind: str, rows):
+    """Run the handler and delete the jobs in one transaction, so a success is never re-run."""
+    HANDLERS[kind](db, [row.payload for row in rows])
+    db.execute(
+        delete(models.Job).where(models.Job.id.in_([row.id for row in rows]))
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+
+
+def _fail(db: Session, row, error: Exception):
+    """Count the attempt against one job: back off, or give up after JOB_MAX_ATTEMPTS."""
+    failed = row.attempts >= JOB_MAX_ATTEMPTS
+    db.execute(
+        update(models.Job)
+        .where(models.Job.id == row.id)
+        .values(
+            status="failed" if failed else "queued",
+            run_at=datetime.now() + timedelta(seconds=retry_delay(row.attempts)),
+            locked_at=None,
+            last_error=repr(error)[:1000],
+        )
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+
+
+def process_batch(bind, batch_size: int = JOB_BATCH_SIZE) -> int:
+    """Claim and run one batch. Returns how many jobs were claimed (0 when nothing is due)."""
+    with Session(bind) as db:
+        kind, rows = _claim(db, batch_size)
+        if not rows:
+            return 0
+
+        try:
+            _run(db, kind, rows)
+            return len(rows)
+        except Exception as exc:
+            db.rollback()
+            if len(rows) == 1:
+                logger.exception("Job %s (%s) failed", rows[0].id, kind)
+                _fail(db, rows[0], exc)
+                return 1
+            logger.warning("Job batch %s x%d failed; retrying one at a time", kind, len(rows), exc_info=True)
+
+        # Isolate the bad payloads so they do not hold back the rest of the batch
+        for row in rows:
+            try:
+                _run(db, kind, [row])
+            except Exception as exc:
+                db.rollback()
+                logger.exception("Job %s (%s) failed", row.id, kind)
+                _fail(db, row, exc)
+        return len(rows)
+
+
+def run_pending(bind, batch_size: int = JOB_BATCH_SIZE) -> int:
+    """Run every due job now, synchronously (tests, scripts). Returns how many were processed."""
+    total = 0
+    while count := process_batch(bind, batch_size):
+        total += count
+    return total
+
+
+def stats(db: Session) -> dict:
+    counts = {}
+    for kind, status, count in db.query(models.Job.kind, models.Job.status, func.count()).group_by(
+        models.Job.kind, models.Job.status
+    ):
+        counts.setdefault(kind, {})[status] = count
+    return counts
+
+
+# ---------------- WORKER POOL ---------------- #
+
+class JobWorkers:
+    """asyncio tasks polling the queue; started and drained by the app lifespan."""
+
+    def __init__(self):
+        self._tasks = []
+        self._loop = None
+        self._wakeup = None
+        self._draining = False
+        self._lock = threading.Lock()
+
+    async def start(self, bind, workers: int = JOB_WORKERS):
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._draining = False
+        self._tasks = [asyncio.create_task(self._run(bind)) for _ in range(workers)]
+
+    def notify(self):
+        """Wake an idle worker after a commit that enqueued jobs. Safe to call from any thread."""
+        with self._lock:
+            if self._loop is not None and not self._loop.is_closed():
+                self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    async def _run(self, bind):
+        while True:
+            try:
+                claimed = await run_in_threadpool(process_batch, bind)
+            except Exception:
+                logger.exception("Job worker error")
+                claimed = 0
+            if claimed:
+                continue
+            if self._draining:
+                return
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), JOB_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+
+    async def stop(self, timeout: float = JOB_DRAIN_TIMEOUT):
+        """Finish what is due, then stop. Jobs still running after `timeout` are retried later."""
+        if not self._tasks:
+            return
+        self._draining = True
+        self._wakeup.set()
+        done, pending = await asyncio.wait(self._tasks, timeout=timeout)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        if pending:
+            logger.warning("Job drain timed out; %d worker(s) cancelled", len(pending))
+        with self._lock:
+            self._tasks = []
+            self._loop = None
+
+
+workers = JobWorkers()
+
+
+# ---------------- HANDLERS ---------------- #
+
+@handler("order_status")
+def record_order_status(db: Session, payloads: list):
+    """Append order status history entries: {"order_id", "status", "at" (ISO time of the change)}."""
+    db.execute(insert(models.OrderStatusHistory), [
+        {"order_id": p["order_id"], "status": p["status"], "timestamp": datetime.fromisoformat(p["at"])}
+        for p in payloads
+    ])
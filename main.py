@@ -1,83 +1,123 @@
 # main.py
-from fastapi import FastAPI, Depends, HTTPException, status
-from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
+import asyncio
+from contextlib import asynccontextmanager, suppress
+import time
+from fastapi import FastAPI, Depends, HTTPException, Request, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
 from datetime import timedelta
 
 import models
-from database import engine, SessionLocal, Base
+from database import engine, async_engine, SessionLocal, Base, log_engine_settings
 import crud
 import schemas
 import auth
+import hashing
+import thumbnails
+import reservations
+import jobs
+from principals import current_user
 from products import router as products_router
 from database import get_db
 from cart import router as cart_router
 from orders import router as orders_router
 from admin import router as admin_router
 from addresses import router as addresses_router
+from fastapi.responses import PlainTextResponse
 from fastapi.staticfiles import StaticFiles
+import metrics
+import diagnostics
 
 
 
 
 #Base.metadata.create_all(bind=engine) - comment out for testing purposes
 
-app = FastAPI(title="E-commerce API (Auth module)")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    log_engine_settings(engine)
+    sweeper = asyncio.create_task(reservations.run_sweeper(engine))
+    await jobs.workers.start(engine)
+    yield
+    await jobs.workers.stop()
+    sweeper.cancel()
+    with suppress(asyncio.CancelledError):
+        await sweeper
+    thumbnails.shutdown()
+    hashing.hashing_pool.shutdown()
+
+app = FastAPI(title="E-commerce API (Auth module)", lifespan=lifespan)
 app.include_router(products_router)
 app.include_router(cart_router)
 app.include_router(orders_router)
 app.include_router(admin_router)
 app.include_router(addresses_router)
 
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
+for _engine in (engine, async_engine.sync_engine):
+    metrics.instrument_engine(_engine)
+    diagnostics.instrument_engine(_engine)
+
+# Per-route latency, status codes and SQL statement counts for /metrics,
+# plus the N+1 detector from diagnostics.py
+@app.middleware("http")
+async def record_metrics(request: Request, call_next):
+    stats = metrics.begin_request()
+    diagnostics.begin_request()
+    metrics.registry.started()
+    started = time.perf_counter()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        route_path = route.path if route is not None else "unmatched"
+        metrics.registry.finished(
+            request.method, route_path, status_code, time.perf_counter() - started, stats
+        )
+        diagnostics.end_request(f"{request.method} {route_path}")
+
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics():
+    return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4")
 
 app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
 
 # Create user (signup)
+# Password hashing runs in the hashing process pool; the short DB calls
+# go to the threadpool so the event loop never blocks on either.
 @app.post("/signup", response_model=schemas.UserOut)
-def signup(user_in: schemas.UserCreate, db: Session = Depends(get_db)):
-    existing = crud.get_user_by_email(db, user_in.email)
+async def signup(user_in: schemas.UserCreate, db: Session = Depends(get_db)):
+    existing = await run_in_threadpool(crud.get_user_by_email, db, user_in.email)
     if existing:
         raise HTTPException(status_code=400, detail="Email already registered")
-    user = crud.create_user(db, user_in)
+    hashed = await hashing.hash_password(user_in.password)
+    user = await run_in_threadpool(crud.create_user, db, user_in, hashed)
     return user
 
 # Token endpoint (login). Uses form fields: username, password
 @app.post("/token", response_model=schemas.Token)
-def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
     # note: OAuth2PasswordRequestForm uses 'username' field for email by default
-    user = crud.authenticate_user(db, form_data.username, form_data.password)
-    if not user:
+    user = await run_in_threadpool(crud.get_user_by_email, db, form_data.username)
+    if not user or not await hashing.verify_password(form_data.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    # Upgrade hashes made with an older cost factor while we have the password
+    if hashing.needs_rehash(user.hashed_password):
+        new_hash = await hashing.hash_password(form_data.password)
+        await run_in_threadpool(crud.update_password_hash, db, user, new_hash)
+
     access_token_expires = timedelta(minutes=auth.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = auth.create_access_token(data={"sub": user.email}, expires_delta=access_token_expires)
     return {"access_token": access_token, "token_type": "bearer"}
 
-# Utility dependency: get current user from token
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    credentials_exception = HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Could not validate credentials",
-            headers={"WWW-Authenticate": "Bearer"},
-    )
-    try:
-        payload = auth.decode_access_token(token)
-        email: str = payload.get("sub")
-        if email is None:
-            raise credentials_exception
-    except Exception:
-        # covers JWTError / decode errors
-        raise credentials_exception
-    user = crud.get_user_by_email(db, email)
-    if user is None:
-        raise credentials_exception
-    return user
-
 # Protected route example
 @app.get("/me", response_model=schemas.UserOut)
-def read_users_me(current_user: models.User = Depends(get_current_user)):
-    return current_user
+def read_users_me(user: models.User = Depends(current_user)):
+    return user
@@ -0,0 +1,158 @@
+"""
+Per-route request metrics in Prometheus text format, served at /metrics.
+
+The HTTP middleware in main.py records latency, status codes and in-flight
+requests. The shared timing hook in query_timing.py counts statements and
+time spent in the database, attributing them to the request that issued
+them through a context variable. No client library is needed; the
+exposition format is rendered here.
+"""
+import threading
+from collections import defaultdict
+from contextvars import ContextVar
+
+import query_timing
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (1, 2, 5, 10, 20, 50, 100)
+
+
+class RequestStats:
+    __slots__ = ("statements", "db_seconds")
+
+    def __init__(self):
+        self.statements = 0
+        self.db_seconds = 0.0
+
+
+_current = ContextVar("request_stats", default=None)
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.sum += value
+        self.count += 1
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+    def render(self, name, labels):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            lines.append(f"{name}_bucket{_labels(labels, le=_number(bound))} {cumulative}")
+        lines.append(f'{name}_bucket{_labels(labels, le="+Inf")} {self.count}')
+        lines.append(f"{name}_sum{_labels(labels)} {_number(self.sum)}")
+        lines.append(f"{name}_count{_labels(labels)} {self.count}")
+        return lines
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels, **extra):
+    pairs = list(labels) + list(extra.items())
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in pairs) + "}"
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.in_flight = 0
+            self.requests = defaultdict(int)        # (method, route, status) -> count
+            self.latency = {}                       # (method, route) -> Histogram
+            self.statements = {}                    # (method, route) -> Histogram
+            self.db_seconds = defaultdict(float)    # (method, route) -> seconds
+
+    def started(self):
+        with self._lock:
+            self.in_flight += 1
+
+    def finished(self, method, route, status, seconds, stats: RequestStats):
+        key = (method, route)
+        with self._lock:
+            self.in_flight -= 1
+            self.requests[(method, route, str(status))] += 1
+            self.latency.setdefault(key, Histogram(LATENCY_BUCKETS)).observe(seconds)
+            self.statements.setdefault(key, Histogram(STATEMENT_BUCKETS)).observe(stats.statements)
+            self.db_seconds[key] += stats.db_seconds
+
+    def render(self) -> str:
+        out = []
+        with self._lock:
+            out += [
+                "# HELP http_requests_in_flight Requests currently being served.",
+                "# TYPE http_requests_in_flight gauge",
+                f"http_requests_in_flight {self.in_flight}",
+                "# HELP http_requests_total Requests served, by route and status code.",
+                "# TYPE http_requests_total counter",
+            ]
+            for (method, route, status), count in sorted(self.requests.items()):
+                labels = (("method", method), ("route", route), ("status", status))
+                out.append(f"http_requests_total{_labels(labels)} {count}")
+
+            out += [
+                "# HELP http_request_duration_seconds Request latency by route.",
+                "# TYPE http_request_duration_seconds histogram",
+            ]
+            for (method, route), histogram in sorted(self.latency.items()):
+                out += histogram.render("http_request_duration_seconds", (("method", method), ("route", route)))
+
+            out += [
+                "# HELP db_statements_per_request SQL statements executed per request.",
+                "# TYPE db_statements_per_request histogram",
+            ]
+            for (method, route), histogram in sorted(self.statements.items()):
+                out += histogram.render("db_statements_per_request", (("method", method), ("route", route)))
+
+            out += [
+                "# HELP db_time_seconds_total Time spent executing SQL, by route.",
+                "# TYPE db_time_seconds_total counter",
+            ]
+            for (method, route), seconds in sorted(self.db_seconds.items()):
+                labels = (("method", method), ("route", route))
+                out.append(f"db_time_seconds_total{_labels(labels)} {_number(seconds)}")
+        return "\n".join(out) + "\n"
+
+
+registry = Registry()
+
+
+def begin_request() -> RequestStats:
+    stats = RequestStats()
+    _current.set(stats)
+    return stats
+
+
+def _record_statement(conn, statement, parameters, executemany, seconds):
+    stats = _current.get()
+    if stats is not None:
+        stats.statements += 1
+        stats.db_seconds += seconds
+
+
+def instrument_engine(engine):
+    """Attach the statement counters to a (sync) Engine; safe to call twice."""
+    query_timing.on_statement(_record_statement)
+    query_timing.instrument_engine(engine)
@@ -4,7 +4,7 @@ This defines DB tables: User, Product, CartItem, Order, OrderItem.
 
 """
 from datetime import datetime
-from sqlalchemy import Column, DateTime, Integer, String, Float, Boolean, ForeignKey
+from sqlalchemy import DDL, JSON, Column, DateTime, Index, Integer, String, Float, Boolean, ForeignKey, event
 from sqlalchemy.orm import relationship
 from database import Base
 
@@ -33,10 +33,34 @@ class Product(Base):
     description = Column(String)
     price = Column(Float)
     stock = Column(Integer, default=0)
+    reserved = Column(Integer, nullable=False, default=0, server_default="0")  # units held in carts, see reservations.py
     is_active = Column(Boolean, default=True)
 
     images = relationship("ProductImage", back_populates="product")
 
+    __table_args__ = (
+        Index("ix_products_is_active_price", "is_active", "price"),
+        Index("ix_products_stock", "stock"),
+    )
+
+
+# Full-text index over product name/description, maintained by search.py.
+# It is a virtual table, so it lives outside the ORM metadata and is created
+# and dropped alongside it on SQLite.
+event.listen(
+    Base.metadata,
+    "after_create",
+    DDL(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS products_fts "
+        "USING fts5(name, description, tokenize = 'unicode61 remove_diacritics 2')"
+    ).execute_if(dialect="sqlite"),
+)
+event.listen(
+    Base.metadata,
+    "before_drop",
+    DDL("DROP TABLE IF EXISTS products_fts").execute_if(dialect="sqlite"),
+)
+
 class Cart(Base):
     __tablename__ = "cart"
 
@@ -48,16 +72,40 @@ class Cart(Base):
     user = relationship("User", back_populates="cart_items")
     product = relationship("Product")
 
+    # One line per product per user; also the conflict target for crud.add_to_cart
+    __table_args__ = (
+        Index("uq_cart_user_product", "user_id", "product_id", unique=True),
+    )
+
+class Reservation(Base):
+    """A time-limited hold on `quantity` units of a product for one shopper's cart."""
+    __tablename__ = "reservations"
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    product_id = Column(Integer, ForeignKey("products.id", ondelete="CASCADE"), nullable=False)
+    quantity = Column(Integer, nullable=False)
+    expires_at = Column(DateTime, nullable=False)
+
+    __table_args__ = (
+        Index("uq_reservations_user_product", "user_id", "product_id", unique=True),
+        Index("ix_reservations_expires_at", "expires_at"),
+    )
+
 class OrderStatusHistory(Base):
     __tablename__ = "order_status_history"
 
     id = Column(Integer, primary_key=True)
     order_id = Column(Integer, ForeignKey("orders.id", ondelete="CASCADE"))
     status = Column(String)
-    timestamp = Column(DateTime, default=datetime.now())
+    timestamp = Column(DateTime, default=datetime.now)
 
     order = relationship("Order", back_populates="status_history")
 
+    __table_args__ = (
+        Index("ix_order_status_history_order_id_timestamp", "order_id", "timestamp"),
+    )
+
 
 
 class Order(Base):
@@ -72,7 +120,7 @@ class Order(Base):
     paid_at = Column(DateTime, nullable=True)
     refunded_at = Column(DateTime, nullable=True)
 
-    created_at = Column(DateTime, default=datetime.now()) 
+    created_at = Column(DateTime, default=datetime.now)
 
     shipping_name = Column(String)
     shipping_phone = Column(String)
@@ -91,6 +139,10 @@ class Order(Base):
         cascade="all, delete"
     )
 
+    __table_args__ = (
+        Index("ix_orders_user_id_created_at", "user_id", "created_at"),
+    )
+
 class OrderItem(Base):
     __tablename__ = "order_items"
 
@@ -113,9 +165,47 @@ class ProductImage(Base):
     file_path = Column(String, nullable = True)  # stored file name / path
     alt_text = Column(String, nullable=True)
     is_primary = Column(Boolean, default=False)
+    variants = Column(JSON, nullable=True)  # {"thumb": url, "card": url, "detail": url}
 
     product = relationship("Product", back_populates="images")
 
+class StatCounter(Base):
+    """
+    Running totals for the admin dashboard, updated in the same transaction
+    as the writes they summarize (see crud.bump_stats).
+
+    Names: "users", "products", "orders" and "revenue:<order status>".
+    """
+    __tablename__ = "stat_counters"
+
+    name = Column(String, primary_key=True)
+    value = Column(Float, nullable=False, default=0)
+
+
+class Job(Base):
+    """
+    A queued side effect (status history, emails, webhooks...), run by jobs.py.
+
+    Enqueued in the same transaction as the write that causes it, so a job
+    exists exactly when that write was committed.
+    """
+    __tablename__ = "jobs"
+
+    id = Column(Integer, primary_key=True)
+    kind = Column(String, nullable=False)
+    payload = Column(JSON, nullable=False)
+    status = Column(String, nullable=False, default="queued")   # queued, running, failed
+    attempts = Column(Integer, nullable=False, default=0)
+    run_at = Column(DateTime, nullable=False, default=datetime.now)
+    locked_at = Column(DateTime, nullable=True)
+    last_error = Column(String, nullable=True)
+    created_at = Column(DateTime, nullable=False, default=datetime.now)
+
+    __table_args__ = (
+        Index("ix_jobs_status_run_at", "status", "run_at"),
+    )
+
+
 class Address(Base):
     __tablename__ = "addresses"
 
@@ -135,3 +225,7 @@ class Address(Base):
 
     user = relationship("User", back_populates="addresses")
 
+    __table_args__ = (
+        Index("ix_addresses_user_id_is_primary", "user_id", "is_primary"),
+    )
+
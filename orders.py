@@ -1,13 +1,21 @@
 # orders.py
 from datetime import datetime
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from typing import Literal
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import load_only, selectinload
 
 import models
+import async_crud
 import crud
-from auth import get_current_user
-from schemas import OrderSchema
-from database import get_db
+import jobs
+from principals import async_current_user
+from schemas import OrderSchema, OrderSummary, Page
+from pagination import MAX_PAGE_SIZE, page, paginate
+from fieldsets import parse_fields, partial_schema, wants
+from serialization import DictResponse, model_response
+from database import get_async_db
 
 router = APIRouter(prefix="/orders", tags=["Orders"])
 
@@ -15,43 +23,104 @@ router = APIRouter(prefix="/orders", tags=["Orders"])
 #  Create order from cart
 # -----------------------------------------------------
 @router.post("/", response_model=OrderSchema)
-def create_order(db: Session = Depends(get_db), user=Depends(get_current_user)):
+async def create_order(db: AsyncSession = Depends(get_async_db), user=Depends(async_current_user)):
     
-    order = crud.create_order_from_cart(db, user.id)
+    order = await async_crud.create_order_from_cart(db, user.id)
     if not order:
         raise HTTPException(400, "Cart is empty")
+    jobs.workers.notify()
     return order
 
 
 # -----------------------------------------------------
 #  List user's orders
 # -----------------------------------------------------
-@router.get("/", response_model=list[OrderSchema])
-def list_orders(db: Session = Depends(get_db), user=Depends(get_current_user)):
-    return db.query(models.Order).filter(models.Order.user_id == user.id).all()
+@router.get("/", response_model=Page[OrderSchema] | Page[OrderSummary])
+async def list_orders(
+    cursor: str | None = None,
+    limit: int = Query(20, ge=1, le=MAX_PAGE_SIZE),
+    include_total: bool = False,
+    view: Literal["full", "summary"] = "full",
+    fields: str | None = Query(None, description="Comma separated fields to return"),
+    db: AsyncSession = Depends(get_async_db),
+    user=Depends(async_current_user)
+):
+    schema = OrderSummary if view == "summary" else OrderSchema
+    selected = parse_fields(fields, schema)
+
+    # Newest first, paged on (created_at, id)
+    own_orders = select(models.Order).where(models.Order.user_id == user.id)
+    total = await async_crud.count(db, own_orders) if include_total else None
+    if view == "summary":
+        # One aggregate query: the order columns plus a count of its lines
+        query = (
+            select(
+                models.Order.id,
+                models.Order.status,
+                models.Order.total_amount,
+                models.Order.created_at,
+                func.count(models.OrderItem.id).label("item_count"),
+            )
+            .outerjoin(models.OrderItem, models.OrderItem.order_id == models.Order.id)
+            .where(models.Order.user_id == user.id)
+            .group_by(models.Order.id)
+        )
+    else:
+        query = _order_loader(own_orders, selected)
+
+    query = paginate(query, models.Order.created_at, models.Order.id, cursor, limit, descending=True)
+    result = await db.execute(query)
+    rows = result.all() if view == "summary" else result.scalars().all()
+    orders, next_cursor = page(rows, limit, key=lambda o: (o.created_at, o.id))
+    return model_response(
+        Page[partial_schema(schema, selected)],
+        {"items": orders, "next_cursor": next_cursor, "total": total},
+    )
+
+
+def _order_loader(query, selected):
+    """Load only the requested order columns, and the items only when asked for."""
+    if selected is not None:
+        columns = [
+            getattr(models.Order, name) for name in selected if name != "items"
+        ] + [models.Order.created_at]
+        query = query.options(load_only(*columns))
+    if wants(selected, "items"):
+        query = query.options(selectinload(models.Order.items))
+    return query
 
 
 # -----------------------------------------------------
 #  Get single order
 # -----------------------------------------------------
 @router.get("/{order_id}", response_model=OrderSchema)
-def get_order(order_id: int, db: Session = Depends(get_db), user=Depends(get_current_user)):
-    order = db.query(models.Order).filter(
-        models.Order.id == order_id,
-        models.Order.user_id == user.id
-    ).first()
+async def get_order(
+    order_id: int,
+    fields: str | None = Query(None, description="Comma separated fields to return"),
+    db: AsyncSession = Depends(get_async_db),
+    user=Depends(async_current_user)
+):
+    selected = parse_fields(fields, OrderSchema)
+    order = (await db.execute(
+        _order_loader(select(models.Order), selected).where(
+            models.Order.id == order_id,
+            models.Order.user_id == user.id
+        )
+    )).scalars().first()
 
     if not order:
         raise HTTPException(404, "Order not found")
 
-    return order
+    return model_response(partial_schema(OrderSchema, selected), order)
 
 
 # -----------------------------------------------------
 #  Admin: Update order status
 # -----------------------------------------------------
 @router.put("/{order_id}/status")
-def update_order_status(order_id: int, status: str, db: Session = Depends(get_db), user=Depends(get_current_user)):
+async def update_order_status(
+    order_id: int, status: str, db: AsyncSession = Depends(get_async_db), user=Depends(async_current_user)
+):
 
     allowed_status = ["Pending", "Paid", "Packed", "Shipped", "Out for Delivery", "Delivered", "Cancelled", "Returned"]
 
@@ -61,32 +130,29 @@ def update_order_status(order_id: int, status: str, db: Session = Depends(get_db
     if not getattr(user, "is_admin", False):
         raise HTTPException(403, "Admins only")
 
-    order = db.query(models.Order).filter(models.Order.id == order_id).first()
+    order = await async_crud.get_order(db, order_id)
     if not order:
         raise HTTPException(404, "Order not found")
 
-    order.status = status
-    db.commit()
-
-    # Save to history
+    await async_crud.set_order_status(db, order, status)
+    # History is written by the job queue, committed together with the status
     crud.log_status(db, order_id, status)
+    await db.commit()
+    jobs.workers.notify()
 
-    db.refresh(order)
+    await db.refresh(order)
     return {"message": "Status updated", "new_status": order.status}
 
-@router.get("/{order_id}/timeline")
-def order_timeline(order_id: int, db: Session = Depends(get_db), user=Depends(get_current_user)):
-    order = db.query(models.Order).filter(
-        models.Order.id == order_id,
-        models.Order.user_id == user.id
-    ).first()
+@router.get("/{order_id}/timeline", response_class=DictResponse)
+async def order_timeline(
+    order_id: int, db: AsyncSession = Depends(get_async_db), user=Depends(async_current_user)
+):
+    order = await async_crud.get_user_order(db, user.id, order_id)
 
     if not order:
         raise HTTPException(404, "Order not found")
 
-    timeline = db.query(models.OrderStatusHistory).filter(
-        models.OrderStatusHistory.order_id == order_id
-    ).order_by(models.OrderStatusHistory.timestamp.asc()).all()
+    timeline = await async_crud.get_order_timeline(db, order_id)
 
     return [
         {
@@ -101,16 +167,15 @@ def order_timeline(order_id: int, db: Session = Depends(get_db), user=Depends(ge
 # -----------------------------------------------------
 #  MOCK PAYMENT (no real gateway)
 # -----------------------------------------------------
-@router.post("/{order_id}/pay")
-def mock_pay_order(order_id: int, db: Session = Depends(get_db), user=Depends(get_current_user)):
+@router.post("/{order_id}/pay", response_class=DictResponse)
+async def mock_pay_order(
+    order_id: int, db: AsyncSession = Depends(get_async_db), user=Depends(async_current_user)
+):
     """
     Simulate a successful payment without any real gateway.
     """
 
-    order = db.query(models.Order).filter(
-        models.Order.id == order_id,
-        models.Order.user_id == user.id
-    ).first()
+    order = await async_crud.get_user_order(db, user.id, order_id)
 
     if not order:
         raise HTTPException(404, "Order not found")
@@ -119,12 +184,13 @@ def mock_pay_order(order_id: int, db: Session = Depends(get_db), user=Depends(ge
         raise HTTPException(400, f"Order is already {order.status}")
 
     # Simulate successful payment
-    order.status = "Paid"
+    await async_crud.set_order_status(db, order, "Paid")
     order.paid_at = datetime.now()
-
-    db.commit()
     crud.log_status(db, order.id, "Paid")
-    db.refresh(order)
+
+    await db.commit()
+    jobs.workers.notify()
+    await db.refresh(order)
 
     return {
         "message": "Mock payment successful",
@@ -138,13 +204,12 @@ def mock_pay_order(order_id: int, db: Session = Depends(get_db), user=Depends(ge
 # -----------------------------------------------------
 #  MOCK REFUND API
 # -----------------------------------------------------
-@router.post("/{order_id}/refund")
-def mock_refund(order_id: int, db: Session = Depends(get_db), user=Depends(get_current_user)):
+@router.post("/{order_id}/refund", response_class=DictResponse)
+async def mock_refund(
+    order_id: int, db: AsyncSession = Depends(get_async_db), user=Depends(async_current_user)
+):
 
-    order = db.query(models.Order).filter(
-        models.Order.id == order_id,
-        models.Order.user_id == user.id
-    ).first()
+    order = await async_crud.get_user_order(db, user.id, order_id)
 
     if not order:
         raise HTTPException(404, "Order not found")
@@ -153,11 +218,13 @@ def mock_refund(order_id: int, db: Session = Depends(get_db), user=Depends(get_c
         raise HTTPException(400, "Only paid orders can be refunded")
 
     # Simulate refund
-    order.status = "Refunded"
+    await async_crud.set_order_status(db, order, "Refunded")
     order.refunded_at = datetime.now()
+    crud.log_status(db, order.id, "Refunded")
 
-    db.commit()
-    db.refresh(order)
+    await db.commit()
+    jobs.workers.notify()
+    await db.refresh(order)
 
     return {
         "message": "Mock refund successful",
@@ -0,0 +1,70 @@
+"""
+Keyset (cursor) pagination for list endpoints.
+
+A page is addressed by an opaque cursor holding the (sort_key, id) of the
+last row already served. The next page is fetched with
+`WHERE (sort_key, id) > (:sort_key, :id)`, which stays an index seek no
+matter how deep the client pages, unlike OFFSET.
+"""
+import base64
+import json
+from datetime import datetime
+
+from fastapi import HTTPException
+from sqlalchemy import DateTime, literal, tuple_
+
+MAX_PAGE_SIZE = 100
+
+
+def encode_cursor(sort_value, row_id: int) -> str:
+    if isinstance(sort_value, datetime):
+        sort_value = sort_value.isoformat()
+    raw = json.dumps([sort_value, row_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort_column):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        sort_value, row_id = json.loads(raw)
+        if isinstance(getattr(sort_column, "type", None), DateTime) and sort_value is not None:
+            sort_value = datetime.fromisoformat(sort_value)
+        return sort_value, int(row_id)
+    except (ValueError, TypeError):
+        raise HTTPException(400, "Invalid cursor")
+
+
+def paginate(query, sort_column, id_column, cursor: str | None, limit: int, descending: bool = False):
+    """
+    Add keyset filtering, ordering and the LIMIT to `query`.
+
+    One extra row is fetched so `page()` can tell whether another page
+    exists without running a COUNT. Works on `db.query(...)` and `select(...)`.
+    """
+    single_key = sort_column is id_column
+
+    if cursor:
+        sort_value, row_id = decode_cursor(cursor, sort_column)
+        if single_key:
+            key, bound = id_column, row_id
+        else:
+            key = tuple_(sort_column, id_column)
+            bound = tuple_(literal(sort_value), literal(row_id))
+        query = query.filter(key < bound if descending else key > bound)
+
+    columns = (id_column,) if single_key else (sort_column, id_column)
+    query = query.order_by(*(c.desc() if descending else c.asc() for c in columns))
+    return query.limit(limit + 1)
+
+
+def page(rows: list, limit: int, key):
+    """
+    Trim the look-ahead row from a `paginate()` result.
+
+    `key(row)` returns the (sort_value, id) of a row. Returns the rows to
+    serve and the cursor of the next page, or None on the last page.
+    """
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(*key(rows[-1]))
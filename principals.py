@@ -0,0 +1,162 @@
+"""
+Bounded TTL cache for authenticated principals, and the auth dependencies
+built on it.
+
+`current_user` resolves the JWT subject (the user's email) to a User on
+every authenticated request. The cache keeps a column snapshot of recently
+seen users so repeated requests skip the lookup. A hit is re-attached to
+the request's session as a persistent instance without emitting a query.
+Routers depend on `current_user` / `require_admin` from here, or on
+`async_current_user` / `async_require_admin` for `async def` handlers on an
+AsyncSession.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from fastapi import Depends, HTTPException, status
+from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy import inspect
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, make_transient_to_detached
+
+import async_crud
+import auth
+import models
+from database import get_async_db, get_db
+
+PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", "1024"))
+PRINCIPAL_CACHE_TTL = float(os.getenv("PRINCIPAL_CACHE_TTL", "30"))
+
+
+class PrincipalCache:
+    def __init__(self, maxsize: int = PRINCIPAL_CACHE_SIZE, ttl: float = PRINCIPAL_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()   # email -> (expires_at, column snapshot)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _detached(self, email: str):
+        with self._lock:
+            entry = self._entries.get(email)
+            if entry is None or entry[0] <= time.monotonic():
+                if entry is not None:
+                    del self._entries[email]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(email)
+            self.hits += 1
+            snapshot = entry[1]
+
+        user = models.User(**snapshot)
+        make_transient_to_detached(user)
+        return user
+
+    def get(self, db: Session, email: str):
+        """Return the cached user attached to `db`, or None on a miss."""
+        user = self._detached(email)
+        return db.merge(user, load=False) if user is not None else None
+
+    async def get_async(self, db: AsyncSession, email: str):
+        """`get` for an AsyncSession."""
+        user = self._detached(email)
+        return await db.merge(user, load=False) if user is not None else None
+
+    def put(self, user: models.User):
+        if self.ttl <= 0 or self.maxsize <= 0:
+            return
+        snapshot = {attr.key: getattr(user, attr.key) for attr in inspect(models.User).column_attrs}
+        with self._lock:
+            self._entries[user.email] = (time.monotonic() + self.ttl, snapshot)
+            self._entries.move_to_end(user.email)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, email: str):
+        with self._lock:
+            self._entries.pop(email, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+principal_cache = PrincipalCache()
+
+
+# ---------------- DEPENDENCIES ---------------- #
+
+oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
+
+
+def _credentials_exception():
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Could not validate credentials",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+
+def _token_subject(token: str) -> str:
+    try:
+        email = auth.decode_access_token(token).get("sub")
+    except Exception:
+        # covers JWTError / decode errors
+        raise _credentials_exception()
+    if email is None:
+        raise _credentials_exception()
+    return email
+
+
+def current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> models.User:
+    email = _token_subject(token)
+
+    # Recently seen principals are served from the cache without a query
+    user = principal_cache.get(db, email)
+    if user is None:
+        user = db.query(models.User).filter(models.User.email == email).first()
+        if user is None or not user.is_active:
+            raise _credentials_exception()
+        principal_cache.put(user)
+    return user
+
+
+async def async_current_user(
+    token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)
+) -> models.User:
+    email = _token_subject(token)
+
+    user = await principal_cache.get_async(db, email)
+    if user is None:
+        user = await async_crud.get_user_by_email(db, email)
+        if user is None or not user.is_active:
+            raise _credentials_exception()
+        principal_cache.put(user)
+    return user
+
+
+def require_admin(user: models.User = Depends(current_user)) -> models.User:
+    if not user.is_admin:
+        raise HTTPException(403, "Admins only")
+    return user
+
+
+async def async_require_admin(user: models.User = Depends(async_current_user)) -> models.User:
+    if not user.is_admin:
+        raise HTTPException(403, "Admins only")
+    return user
@@ -1,15 +1,29 @@
+import hashlib
 import os
+from typing import Literal
 from uuid import uuid4
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
-from sqlalchemy.orm import Session
-from database import get_db
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, UploadFile, File
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, selectinload
+from database import get_async_db, get_db
 import models
 from schemas import ProductCreate, Product
 import crud
-from auth import get_current_user
+import async_crud
+import search as search_engine
+import thumbnails
+from fieldsets import parse_fields, partial_schema, wants
+from catalog_cache import catalog_cache
+from pagination import MAX_PAGE_SIZE, page, paginate
+from principals import current_user
 import schemas
 
 UPLOAD_FOLDER = "uploads/products"
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+MAX_IMAGE_BYTES = int(os.getenv("MAX_IMAGE_BYTES", str(10 * 1024 * 1024)))
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(50 * 1024 * 1024)))
 router = APIRouter(prefix="/products", tags=["Products"])
 
 
@@ -19,9 +33,11 @@ router = APIRouter(prefix="/products", tags=["Products"])
 def create_product_api(
     product: ProductCreate,
     db: Session = Depends(get_db),
-    user=Depends(get_current_user)
+    user=Depends(current_user)
 ):
-    return crud.create_product(db, product)
+    product = crud.create_product(db, product)
+    catalog_cache.invalidate_product(product.id)
+    return product
 
 
 #-----------------------------------------------------------------------------------
@@ -30,24 +46,60 @@ def create_product_api(
 
 # Public - single product
 @router.get("/{product_id}", response_model=Product)
-def get_product_api(product_id: int, db: Session = Depends(get_db)):
-    product = crud.get_product(db, product_id)
-    if not product:
-        raise HTTPException(404, "Product not found")
-    return product
+async def get_product_api(
+    product_id: int,
+    request: Request,
+    fields: str | None = Query(None, description="Comma separated fields to return"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    selected = parse_fields(fields, Product)
+    key = ("product", product_id, selected)
+    cached = catalog_cache.get(key)
+    if cached is None:
+        generation = catalog_cache.generation
+        product = await async_crud.get_product(db, product_id, with_images=wants(selected, "images"))
+        if not product:
+            raise HTTPException(404, "Product not found")
+        schema = partial_schema(Product, selected)
+        body = schema.model_validate(product).model_dump_json()
+        cached = catalog_cache.put(key, body.encode(), [product_id], generation)
+    return cached.to_response(request)
 
 # Filters + Search Route
-@router.get("/", response_model=list[schemas.Product])
-def list_products(
-    skip: int = 0,
-    limit: int = 10,
+PRODUCT_SORT_KEYS = {
+    "id": models.Product.id,
+    "price": models.Product.price,
+    "name": models.Product.name,
+}
+
+@router.get("/", response_model=schemas.Page[schemas.Product])
+async def list_products(
+    request: Request,
+    cursor: str | None = None,
+    limit: int = Query(10, ge=1, le=MAX_PAGE_SIZE),
+    sort: Literal["id", "price", "name"] = "id",
+    descending: bool = False,
     min_price: float | None = None,
     max_price: float | None = None,
     search: str | None = None,
     is_active: bool | None = None,
-    db: Session = Depends(get_db)
+    include_total: bool = False,
+    fields: str | None = Query(None, description="Comma separated fields to return"),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    query = db.query(models.Product)
+    selected = parse_fields(fields, schemas.Product)
+    key = (
+        "list", cursor, limit, sort, descending, min_price, max_price,
+        " ".join(search.lower().split()) if search else None, is_active, include_total, selected,
+    )
+    cached = catalog_cache.get(key)
+    if cached is not None:
+        return cached.to_response(request)
+    generation = catalog_cache.generation
+
+    query = select(models.Product)
+    if wants(selected, "images"):
+        query = query.options(selectinload(models.Product.images))
 
     if min_price is not None:
         query = query.filter(models.Product.price >= min_price)
@@ -55,14 +107,32 @@ def list_products(
     if max_price is not None:
         query = query.filter(models.Product.price <= max_price)
 
-    if search:
-        query = query.filter(models.Product.name.ilike(f"%{search}%"))
-
     if is_active is not None:
         query = query.filter(models.Product.is_active == is_active)
 
-    products = query.offset(skip).limit(limit).all()
-    return products
+    rank = None
+    if search:
+        query, rank = search_engine.apply_search(query, search, db.bind.dialect.name)
+
+    total = await async_crud.count(db, query) if include_total else None
+
+    if rank is not None:
+        # Search results are paged in relevance order: (rank, id)
+        query = paginate(query.add_columns(rank), rank, models.Product.id, cursor, limit)
+        rows = (await db.execute(query)).all()
+        rows, next_cursor = page(rows, limit, key=lambda row: (row[1], row[0].id))
+        products = [row[0] for row in rows]
+    else:
+        sort_column = PRODUCT_SORT_KEYS[sort]
+        query = paginate(query, sort_column, models.Product.id, cursor, limit, descending)
+        rows = (await db.execute(query)).scalars().all()
+        products, next_cursor = page(rows, limit, key=lambda p: (getattr(p, sort), p.id))
+
+    body = schemas.Page[partial_schema(schemas.Product, selected)].model_validate(
+        {"items": products, "next_cursor": next_cursor, "total": total}
+    ).model_dump_json()
+    cached = catalog_cache.put(key, body.encode(), [p.id for p in products], generation)
+    return cached.to_response(request)
 
 #-----------------------------------------------------------------------------------
 
@@ -74,17 +144,18 @@ def update_product_api(
     product_id: int,
     updated_data: ProductCreate,
     db: Session = Depends(get_db),
-    user=Depends(get_current_user)
+    user=Depends(current_user)
 ):
     product = crud.update_product(db, product_id, updated_data)
     if not product:
         raise HTTPException(404, "Product not found")
+    catalog_cache.invalidate_product(product_id)
     return product
 
 # Active/Inactive Toggle Route
 @router.put("/{product_id}/toggle", response_model=schemas.Product)
 def toggle_product(product_id: int, db: Session = Depends(get_db), 
-    current_user: str = Depends(get_current_user)
+    user=Depends(current_user)
 ):
     product = db.query(models.Product).filter(models.Product.id == product_id).first()
 
@@ -94,6 +165,7 @@ def toggle_product(product_id: int, db: Session = Depends(get_db),
     product.is_active = not product.is_active
     db.commit()
     db.refresh(product)
+    catalog_cache.invalidate_product(product_id)
     return product
 
 
@@ -110,52 +182,119 @@ def toggle_product(product_id: int, db: Session = Depends(get_db),
 def delete_product_api(
     product_id: int,
     db: Session = Depends(get_db),
-    user=Depends(get_current_user)
+    user=Depends(current_user)
 ):
     deleted = crud.delete_product(db, product_id)
     if not deleted:
         raise HTTPException(404, "Product not found")
+    catalog_cache.invalidate_product(product_id)
     return {"message": "Product deleted"}
 
 #------------------------------------------------------------------------------------------------
 
+def _publish_upload(tmp_path: str, final_path: str) -> bool:
+    """Move a finished upload into place. Returns False if identical content was already stored."""
+    if os.path.exists(final_path):
+        os.remove(tmp_path)
+        return False
+    os.replace(tmp_path, final_path)
+    return True
+
+
+async def _stream_to_disk(file: UploadFile, budget: int):
+    """
+    Copy an upload to UPLOAD_FOLDER in UPLOAD_CHUNK_SIZE pieces, hashing as it goes.
+
+    Disk writes run in the threadpool so the event loop keeps serving other
+    requests. Files are stored under their SHA-256, so the same image
+    uploaded twice is kept once. Returns (file name, bytes read, newly stored).
+    """
+    ext = os.path.splitext(file.filename or "")[1].lstrip(".").lower() or "bin"
+    tmp_path = os.path.join(UPLOAD_FOLDER, f".{uuid4()}.part")
+    digest = hashlib.sha256()
+    size = 0
+
+    out = await run_in_threadpool(open, tmp_path, "wb")
+    try:
+        while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+            size += len(chunk)
+            if size > MAX_IMAGE_BYTES:
+                raise HTTPException(413, f"{file.filename} exceeds {MAX_IMAGE_BYTES} bytes")
+            if size > budget:
+                raise HTTPException(413, f"Upload exceeds {MAX_UPLOAD_BYTES} bytes in total")
+            digest.update(chunk)
+            await run_in_threadpool(out.write, chunk)
+    except BaseException:
+        await run_in_threadpool(out.close)
+        await run_in_threadpool(os.remove, tmp_path)
+        raise
+    await run_in_threadpool(out.close)
+
+    name = f"{digest.hexdigest()}.{ext}"
+    created = await run_in_threadpool(_publish_upload, tmp_path, os.path.join(UPLOAD_FOLDER, name))
+    return name, size, created
+
+
 @router.post("/{product_id}/images")
 async def upload_images(
     product_id: int,
     files: list[UploadFile] = File(...),
     db: Session = Depends(get_db),
-    user=Depends(get_current_user)
+    user=Depends(current_user)
 ):
     # Only admin can upload
     if not user.is_admin:
         raise HTTPException(403, "Only admin can upload product images")
 
-    product = db.query(models.Product).filter(models.Product.id == product_id).first()
+    product = await run_in_threadpool(crud.get_product, db, product_id)
 
     if not product:
         raise HTTPException(404, "Product not found")
 
-    saved_images = []
-    os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-    for file in files:
-        ext = file.filename.split(".")[-1]
-        unique_name = f"{uuid4()}.{ext}"
-
-        file_path = os.path.join(UPLOAD_FOLDER, unique_name)
-
-        # Save file to disk
-        with open(file_path, "wb") as buffer:
-            buffer.write(await file.read())
-
-        # Save entry in DB
-        image = models.ProductImage(product_id=product_id, 
-                        file_path=f"/uploads/products/{unique_name}")
-        db.add(image)
-        saved_images.append(image)
+    existing = {
+        img.file_path for img in await run_in_threadpool(crud.get_product_images, db, product_id)
+    }
 
-    db.commit()
+    saved_images = []
+    saved_names = []
+    stored = []     # files written by this request, removed again if it fails
+    budget = MAX_UPLOAD_BYTES
+    await run_in_threadpool(os.makedirs, UPLOAD_FOLDER, exist_ok=True)
+    try:
+        for file in files:
+            name, size, created = await _stream_to_disk(file, budget)
+            budget -= size
+            if created:
+                stored.append(os.path.join(UPLOAD_FOLDER, name))
+
+            file_path = f"/uploads/products/{name}"
+            if file_path in existing:
+                continue
+            existing.add(file_path)
+
+            # Save entry in DB
+            image = models.ProductImage(product_id=product_id, file_path=file_path)
+            db.add(image)
+            saved_images.append(image)
+            saved_names.append(name)
+
+        await run_in_threadpool(db.flush)
+        # read back before commit expires the instances
+        variant_jobs = [(img.id, name) for img, name in zip(saved_images, saved_names)]
+        saved_paths = [img.file_path for img in saved_images]
+        await run_in_threadpool(db.commit)
+    except BaseException:
+        await run_in_threadpool(db.rollback)
+        for path in stored:
+            await run_in_threadpool(os.remove, path)
+        raise
+
+    catalog_cache.invalidate_product(product_id, membership_changed=False)
+
+    # Render thumb/card/detail sizes in the background
+    thumbnails.schedule(db.get_bind(), product_id, variant_jobs, UPLOAD_FOLDER)
 
     return {
         "message": "Images uploaded successfully",
-        "images": [img.file_path for img in saved_images]
+        "images": saved_paths
     }
@@ -0,0 +1,57 @@
+"""
+Shared SQLAlchemy timing hook for metrics.py and diagnostics.py.
+
+One set of cursor event listeners per engine times every statement and
+hands the result to the registered observers as
+`observer(conn, statement, parameters, executemany, seconds)`.
+
+Start times are kept on a per-connection stack together with the
+statement's execution context. A statement that raises never reaches
+after_cursor_execute, so handle_error removes its entry; otherwise the
+stack would grow and later statements would be timed against the wrong
+start.
+"""
+import time
+
+from sqlalchemy import event
+
+_STACK_KEY = "query_timing_start"
+
+_observers = []
+
+
+def on_statement(observer):
+    """Register `observer` for every statement on instrumented engines; safe to call twice."""
+    if observer not in _observers:
+        _observers.append(observer)
+    return observer
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault(_STACK_KEY, []).append((context, time.perf_counter()))
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stack = conn.info.get(_STACK_KEY)
+    if not stack:
+        return      # engine was instrumented while this statement was running
+    seconds = time.perf_counter() - stack.pop()[1]
+    for observer in _observers:
+        observer(conn, statement, parameters, executemany, seconds)
+
+
+def _handle_error(exception_context):
+    conn = exception_context.connection
+    stack = conn.info.get(_STACK_KEY) if conn is not None else None
+    # Only the failed statement's own entry: errors raised before
+    # before_cursor_execute ran have nothing on the stack to remove
+    if stack and stack[-1][0] is exception_context.execution_context:
+        stack.pop()
+
+
+def instrument_engine(engine):
+    """Attach the timing hook to a (sync) Engine; safe to call twice."""
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(engine, "handle_error", _handle_error)
@@ -0,0 +1,151 @@
+"""
+Time-limited inventory holds for carted items.
+
+Adding or changing a cart line holds that many units for RESERVATION_TTL.
+Product.reserved is the running total of live holds, kept up to date by
+every write below, so the stock a shopper can still take is
+`stock - reserved`. Checkout consumes the shopper's own holds; holds that
+are never checked out are released in batches by the background sweeper.
+
+Every change first deletes the affected holds with RETURNING. That claims
+them atomically, so a hold is never counted twice, even when the sweeper
+runs at the same time.
+"""
+import asyncio
+import logging
+import os
+from collections import Counter
+from datetime import datetime, timedelta
+
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import bindparam, delete, insert, select, update
+from sqlalchemy.orm import Session
+
+import models
+
+logger = logging.getLogger(__name__)
+
+RESERVATION_TTL = timedelta(seconds=int(os.getenv("RESERVATION_TTL_SECONDS", "900")))
+SWEEP_INTERVAL = float(os.getenv("RESERVATION_SWEEP_INTERVAL", "30"))
+SWEEP_BATCH_SIZE = int(os.getenv("RESERVATION_SWEEP_BATCH", "500"))
+
+_products = models.Product.__table__
+
+
+def take(db: Session, user_id: int, product_ids=None) -> dict:
+    """Delete the user's holds (all, or only for `product_ids`) and return {product_id: quantity}."""
+    stmt = delete(models.Reservation).where(models.Reservation.user_id == user_id)
+    if product_ids is not None:
+        stmt = stmt.where(models.Reservation.product_id.in_(product_ids))
+    stmt = stmt.returning(models.Reservation.product_id, models.Reservation.quantity)
+    return dict(db.execute(stmt.execution_options(synchronize_session=False)).all())
+
+
+def unreserve(db: Session, quantities: dict):
+    """Subtract released units from Product.reserved, one executemany for all products."""
+    rows = [{"pid": pid, "qty": qty} for pid, qty in quantities.items() if qty]
+    if rows:
+        db.execute(
+            update(_products)
+            .where(_products.c.id == bindparam("pid"))
+            .values(reserved=_products.c.reserved - bindparam("qty")),
+            rows,
+        )
+
+
+def hold(db: Session, user_id: int, quantities: dict):
+    """
+    Set the user's holds to {product_id: quantity} and restart their TTL.
+
+    Extra units are only granted while `stock - reserved` covers them;
+    otherwise the whole call fails with 400, as do negative quantities.
+    A quantity of 0 drops the hold. Does not commit.
+    """
+    if any(quantity < 0 for quantity in quantities.values()):
+        raise HTTPException(400, "Quantity cannot be negative")
+    held = take(db, user_id, list(quantities))
+
+    released = {}
+    for product_id, quantity in quantities.items():
+        own = held.get(product_id, 0)
+        if quantity < own:
+            # Never hand back more than this shopper actually held
+            released[product_id] = own - quantity
+        elif quantity > own:
+            delta = quantity - own
+            result = db.execute(
+                update(_products)
+                .where(
+                    _products.c.id == product_id,
+                    _products.c.stock - _products.c.reserved >= delta,
+                )
+                .values(reserved=_products.c.reserved + delta)
+            )
+            if result.rowcount != 1:
+                raise HTTPException(400, f"Not enough stock available for product {product_id}")
+    unreserve(db, released)
+
+    expires_at = datetime.now() + RESERVATION_TTL
+    rows = [
+        {"user_id": user_id, "product_id": product_id, "quantity": quantity, "expires_at": expires_at}
+        for product_id, quantity in quantities.items()
+        if quantity > 0
+    ]
+    if rows:
+        db.execute(insert(models.Reservation), rows)
+
+
+def release(db: Session, user_id: int, product_ids=None):
+    """Drop the user's holds and hand the units back. Does not commit."""
+    unreserve(db, take(db, user_id, product_ids))
+
+
+# ---------------- SWEEPER ---------------- #
+
+def sweep_batch(db: Session, batch_size: int = SWEEP_BATCH_SIZE) -> int:
+    """Release up to `batch_size` expired holds in one transaction. Returns how many."""
+    now = datetime.now()
+    expired = (
+        select(models.Reservation.id)
+        .where(models.Reservation.expires_at <= now)
+        .order_by(models.Reservation.expires_at)
+        .limit(batch_size)
+    )
+    rows = db.execute(
+        delete(models.Reservation)
+        .where(models.Reservation.id.in_(expired), models.Reservation.expires_at <= now)
+        .returning(models.Reservation.product_id, models.Reservation.quantity)
+        .execution_options(synchronize_session=False)
+    ).all()
+
+    totals = Counter()
+    for product_id, quantity in rows:
+        totals[product_id] += quantity
+    unreserve(db, totals)
+    db.commit()
+    return len(rows)
+
+
+def sweep_expired(bind, batch_size: int = SWEEP_BATCH_SIZE) -> int:
+    """Release every expired hold, batch by batch, so no transaction holds the lock for long."""
+    swept = 0
+    with Session(bind) as db:
+        while True:
+            count = sweep_batch(db, batch_size)
+            swept += count
+            if count < batch_size:
+                return swept
+
+
+async def run_sweeper(bind, interval: float = SWEEP_INTERVAL):
+    """Background task started from the app lifespan; cancel it to stop."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            swept = await run_in_threadpool(sweep_expired, bind)
+        except Exception:
+            logger.exception("Reservation sweep failed")
+            continue
+        if swept:
+            logger.info("Released %d expired reservations", swept)
@@ -1,6 +1,18 @@
 # These define request/response models.
-from typing import List, Optional
-from pydantic import BaseModel, EmailStr
+from datetime import datetime
+from typing import Generic, List, Literal, Optional, TypeVar
+from pydantic import BaseModel, ConfigDict, EmailStr, Field
+
+T = TypeVar("T")
+
+
+# ---------- PAGINATION ----------
+# Page wraps every list endpoint. next_cursor is None on the last page and
+# total is only filled in when the client asks for it (include_total=true).
+class Page(BaseModel, Generic[T]):
+    items: List[T]
+    next_cursor: Optional[str] = None
+    total: Optional[int] = None
 
 # ---------- USER ----------
 # UserCreate validates signup payload.
@@ -15,8 +27,14 @@ class UserOut(BaseModel):
     email: EmailStr
     is_active: int
 
-    class ConfigDict:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
+
+
+# AdminUserOut is the admin view of a user account.
+class AdminUserOut(UserOut):
+    is_admin: bool
+
+    model_config = ConfigDict(from_attributes=True)
 
 
 # ---------- TOKEN ---------- 
@@ -34,9 +52,9 @@ class TokenData(BaseModel):
 class ProductImage(BaseModel):
     id: int
     image_url: Optional[str] = None
+    variants: Optional[dict[str, str]] = None   # thumb / card / detail URLs
 
-    class ConfigDict:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 class ProductBase(BaseModel):
@@ -54,14 +72,13 @@ class Product(ProductBase):
     id: int
     images: list[ProductImage] = []
     
-    class ConfigDict:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 # ---------- CART ----------
 class CartItemBase(BaseModel):
     product_id: int
-    quantity: int = 1
+    quantity: int = Field(1, ge=1)
 
 class CartItemCreate(CartItemBase):
     pass
@@ -70,8 +87,16 @@ class CartItemOut(BaseModel):
     id: int
     product_id: int
     quantity: int
-    class ConfigDict:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
+
+# One step of POST /cart/batch. "set" with quantity 0 removes the line.
+class CartOperation(BaseModel):
+    op: Literal["add", "set", "remove"]
+    product_id: int
+    quantity: int = Field(1, ge=0)
+
+class CartBatch(BaseModel):
+    operations: List[CartOperation] = Field(..., max_length=500)
 
 
 # ---------- ORDER ----------
@@ -81,8 +106,7 @@ class OrderItemSchema(BaseModel):
     quantity: int
     price: float
 
-    class ConfigDict:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 class OrderSchema(BaseModel):
@@ -101,8 +125,18 @@ class OrderSchema(BaseModel):
 
     items: List[OrderItemSchema]
 
-    class ConfigDict:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
+
+
+# GET /orders/?view=summary - one aggregate row per order, no line items
+class OrderSummary(BaseModel):
+    id: int
+    status: str
+    total_amount: float
+    created_at: datetime
+    item_count: int
+
+    model_config = ConfigDict(from_attributes=True)
 
 
 # ---------- ADDRESS ----------
@@ -125,5 +159,4 @@ class AddressOut(AddressBase):
     id: int
     is_primary: bool
 
-    class ConfigDict:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
@@ -0,0 +1,117 @@
+"""
+Full-text product search backed by an SQLite FTS5 index.
+
+The `products_fts` virtual table (see models.py) mirrors the name and
+description of every product, keyed by rowid = products.id. crud keeps
+it in sync inside the same transaction as the product write.
+"""
+import re
+
+from sqlalchemy import column, delete, insert, or_, select, table, text
+from sqlalchemy.orm import Session
+
+import models
+
+FTS_TABLE = "products_fts"
+
+products_fts = table(
+    FTS_TABLE,
+    column("rowid"),
+    column("name"),
+    column("description"),
+    column("rank"),
+)
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def to_match_query(term: str):
+    """
+    Turn free text into an FTS5 MATCH expression.
+
+    Every word must match and each one is treated as a prefix, so
+    "wire head" finds "Wireless Headphones" while the user is still typing.
+    Returns None when the term has no searchable words.
+    """
+    tokens = _TOKEN_RE.findall(term or "")
+    if not tokens:
+        return None
+    return " ".join(f'"{token}"*' for token in tokens)
+
+
+def index_product(db: Session, product: models.Product):
+    db.execute(delete(products_fts).where(products_fts.c.rowid == product.id))
+    db.execute(
+        insert(products_fts).values(
+            rowid=product.id,
+            name=product.name or "",
+            description=product.description or "",
+        )
+    )
+
+
+def unindex_product(db: Session, product_id: int):
+    db.execute(delete(products_fts).where(products_fts.c.rowid == product_id))
+
+
+def reindex_products(db: Session, product_ids):
+    """Refresh the index rows of many products at once, e.g. after a bulk import."""
+    product_ids = list(product_ids)
+    if not product_ids:
+        return
+    db.execute(delete(products_fts).where(products_fts.c.rowid.in_(product_ids)))
+    db.execute(
+        insert(products_fts).from_select(
+            ["rowid", "name", "description"],
+            select(
+                models.Product.id,
+                models.Product.name,
+                models.Product.description,
+            ).where(models.Product.id.in_(product_ids)),
+        )
+    )
+
+
+def rebuild_index(db: Session):
+    """Re-populate the whole index from the products table."""
+    db.execute(delete(products_fts))
+    db.execute(
+        insert(products_fts).from_select(
+            ["rowid", "name", "description"],
+            select(
+                models.Product.id,
+                models.Product.name,
+                models.Product.description,
+            ),
+        )
+    )
+
+
+def apply_search(query, term: str, dialect: str = "sqlite"):
+    """
+    Restrict a Product query to rows matching `term`.
+
+    Returns the filtered query and the FTS rank expression to order by
+    (lower is a better match), or None when there is nothing to rank.
+    Works on both `db.query(models.Product)` and `select(models.Product)`.
+    Databases without FTS5 fall back to a LIKE scan over name and description.
+    """
+    match = to_match_query(term)
+    if match is None:
+        return query, None
+
+    if dialect != "sqlite":
+        pattern = f"%{term}%"
+        query = query.filter(
+            or_(
+                models.Product.name.ilike(pattern),
+                models.Product.description.ilike(pattern),
+            )
+        )
+        return query, None
+
+    query = (
+        query.join(products_fts, products_fts.c.rowid == models.Product.id)
+        .filter(text(f"{FTS_TABLE} MATCH :fts_query").bindparams(fts_query=match))
+    )
+    return query, products_fts.c.rank
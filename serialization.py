@@ -0,0 +1,37 @@
+"""
+Response encoding.
+
+Routes with a response_model are serialized by FastAPI itself, straight
+from the pydantic schema to JSON bytes. `model_response` does the same
+for handlers that build their own Response (e.g. sparse fieldsets): one
+`model_validate`, then `model_dump_json`, and FastAPI does not validate
+again.
+
+Handlers that return plain dicts use `DictResponse`, which renders with
+orjson when it is installed. It is set per route, not as the app-wide
+default_response_class. A custom default class makes FastAPI give up the
+pydantic-to-bytes path for response_model routes too, and
+benchmarks/serialization.py shows that path beats dict + orjson.
+"""
+import importlib.util
+
+from fastapi.responses import JSONResponse, Response
+
+ORJSON_AVAILABLE = importlib.util.find_spec("orjson") is not None
+
+if ORJSON_AVAILABLE:
+    import orjson
+
+
+class ORJSONResponse(JSONResponse):
+    def render(self, content) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
+DictResponse = ORJSONResponse if ORJSON_AVAILABLE else JSONResponse
+
+
+def model_response(schema, obj, status_code: int = 200) -> Response:
+    """Validate `obj` (ORM object, row or dict) against `schema` and return it as JSON bytes."""
+    body = schema.model_validate(obj).model_dump_json()
+    return Response(body, status_code=status_code, media_type="application/json")
@@ -1,18 +1,27 @@
 import pytest
 from fastapi.testclient import TestClient
 from main import app
-from database import Base, get_db
-from sqlalchemy import create_engine
+from database import Base, create_async_db_engine, create_db_engine, get_async_db, get_db
+from sqlalchemy.ext.asyncio import async_sessionmaker
 from sqlalchemy.orm import sessionmaker
+from principals import principal_cache
+from catalog_cache import catalog_cache
+import metrics
+import diagnostics
 
 # Create TEST DATABASE
 TEST_DB_URL = "sqlite:///./test_db.sqlite"
 
-engine = create_engine(
-    TEST_DB_URL, connect_args={"check_same_thread": False}
-)
+engine = create_db_engine(TEST_DB_URL)
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+async_engine = create_async_db_engine("sqlite+aiosqlite:///./test_db.sqlite")
+
+for _engine in (engine, async_engine.sync_engine):
+    metrics.instrument_engine(_engine)
+    diagnostics.instrument_engine(_engine)
+TestingAsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 # Override DB dependency
 def override_get_db():
     db = TestingSessionLocal()
@@ -21,19 +30,35 @@ def override_get_db():
     finally:
         db.close()
 
+async def override_get_async_db():
+    async with TestingAsyncSessionLocal() as db:
+        yield db
+
 app.dependency_overrides[get_db] = override_get_db
+app.dependency_overrides[get_async_db] = override_get_async_db
 
 @pytest.fixture(scope="function", autouse=True)
 def setup_database():
     # Reset database before ALL tests
+    principal_cache.clear()
+    catalog_cache.clear()
     Base.metadata.drop_all(bind=engine)
     Base.metadata.create_all(bind=engine)
     yield
     Base.metadata.drop_all(bind=engine)
 
+@pytest.fixture
+def db():
+    session = TestingSessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
 @pytest.fixture
 def client():
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_async_db] = override_get_async_db
     return TestClient(app)
 
 # Helper: create user + return token
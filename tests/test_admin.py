@@ -16,3 +16,142 @@ def test_admin_endpoints(client):
 
     res = client.get("/admin/users", headers={"Authorization": f"Bearer {token}"})
     assert res.status_code == 200
+
+
+def test_admin_users_are_paginated(client):
+    client.post("/signup", json={
+        "email": "admin@example.com",
+        "password": "admin123",
+        "is_admin": True
+    })
+    for i in range(3):
+        client.post("/signup", json={"email": f"u{i}@example.com", "password": "pw"})
+
+    token = client.post(
+        "/token",
+        data={"username": "admin@example.com", "password": "admin123"},
+        headers={"Content-Type": "application/x-www-form-urlencoded"}
+    ).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    first = client.get("/admin/users?limit=3", headers=headers).json()
+    assert len(first["items"]) == 3
+    assert "hashed_password" not in first["items"][0]
+
+    rest = client.get(f"/admin/users?limit=3&cursor={first['next_cursor']}", headers=headers).json()
+    assert [u["email"] for u in rest["items"]] == ["u2@example.com"]
+    assert rest["next_cursor"] is None
+
+
+def test_admin_stats_and_revenue_rollup(client):
+    client.post("/signup", json={
+        "email": "admin@example.com",
+        "password": "admin123",
+        "is_admin": True
+    })
+    token = client.post(
+        "/token",
+        data={"username": "admin@example.com", "password": "admin123"},
+        headers={"Content-Type": "application/x-www-form-urlencoded"}
+    ).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    product = client.post(
+        "/products/",
+        headers=headers,
+        json={"name": "Chair", "description": "Oak", "price": 60, "stock": 5}
+    ).json()
+    client.post(
+        "/addresses/",
+        headers=headers,
+        json={"full_name": "Admin", "phone": "1", "street": "S", "city": "C",
+              "state": "ST", "pincode": "1", "is_primary": True}
+    )
+    client.post("/cart/", headers=headers, json={"product_id": product["id"], "quantity": 2})
+    order = client.post("/orders/", headers=headers).json()
+
+    revenue = client.get("/admin/revenue", headers=headers).json()
+    assert revenue["total_revenue"] == 120
+    assert revenue["revenue_by_status"]["Pending"] == 120
+
+    client.post(f"/orders/{order['id']}/pay", headers=headers)
+    revenue = client.get("/admin/revenue", headers=headers).json()
+    assert revenue["revenue_by_status"] == {"Pending": 0, "Paid": 120}
+
+    stats = client.get("/admin/stats", headers=headers).json()
+    assert stats == {
+        "total_users": 1,
+        "total_orders": 1,
+        "total_products": 1,
+        "total_revenue": 120,
+    }
+
+
+def test_admin_can_rebuild_drifted_stats(client, db):
+    import models
+
+    client.post("/signup", json={"email": "admin@example.com", "password": "admin123", "is_admin": True})
+    token = client.post(
+        "/token",
+        data={"username": "admin@example.com", "password": "admin123"},
+        headers={"Content-Type": "application/x-www-form-urlencoded"}
+    ).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    # products written behind the rollup's back
+    db.add_all(models.Product(name=f"P{i}", description="d", price=1, stock=1) for i in range(3))
+    db.commit()
+    assert client.get("/admin/stats", headers=headers).json()["total_products"] == 0
+
+    rebuilt = client.post("/admin/stats/rebuild", headers=headers).json()
+    assert rebuilt["total_products"] == 3
+    assert rebuilt["total_users"] == 1
+    assert client.get("/admin/stats", headers=headers).json() == rebuilt
+
+
+def test_admin_streaming_exports(client):
+    import csv
+    import io
+    import json
+
+    client.post("/signup", json={
+        "email": "admin@example.com",
+        "password": "admin123",
+        "is_admin": True
+    })
+    token = client.post(
+        "/token",
+        data={"username": "admin@example.com", "password": "admin123"},
+        headers={"Content-Type": "application/x-www-form-urlencoded"}
+    ).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    for name in ("Desk", "Shelf"):
+        product = client.post(
+            "/products/",
+            headers=headers,
+            json={"name": name, "description": "Wood", "price": 100, "stock": 5}
+        ).json()
+        client.post("/cart/", headers=headers, json={"product_id": product["id"], "quantity": 1})
+    client.post(
+        "/addresses/",
+        headers=headers,
+        json={"full_name": "Admin", "phone": "1", "street": "S", "city": "C",
+              "state": "ST", "pincode": "1", "is_primary": True}
+    )
+    client.post("/orders/", headers=headers)
+
+    res = client.get("/admin/export/orders", headers=headers)
+    assert res.headers["content-type"].startswith("application/x-ndjson")
+    orders = [json.loads(line) for line in res.text.splitlines()]
+    assert len(orders) == 1 and len(orders[0]["items"]) == 2
+
+    res = client.get("/admin/export/orders?format=csv", headers=headers)
+    rows = list(csv.DictReader(io.StringIO(res.text)))
+    assert len(rows) == 2 and rows[0]["item_quantity"] == "1"
+
+    res = client.get("/admin/export/products?format=csv", headers=headers)
+    assert [r["name"] for r in csv.DictReader(io.StringIO(res.text))] == ["Desk", "Shelf"]
+
+    res = client.get("/admin/export/users", headers=headers)
+    assert json.loads(res.text.splitlines()[0])["email"] == "admin@example.com"
@@ -10,3 +10,74 @@ def test_signup_and_login(client):
         headers={"Content-Type": "application/x-www-form-urlencoded"}
     )
     assert "access_token" in token_res.json()
+
+
+def test_me_uses_principal_cache(client, user_token):
+    from principals import principal_cache
+
+    headers = {"Authorization": f"Bearer {user_token}"}
+    first = client.get("/me", headers=headers)
+    second = client.get("/me", headers=headers)
+
+    assert first.json() == second.json()
+    assert first.json()["email"] == "user@example.com"
+    assert principal_cache.stats()["misses"] == 1
+    assert principal_cache.stats()["hits"] == 1
+
+    principal_cache.invalidate("user@example.com")
+    assert client.get("/me", headers=headers).status_code == 200
+    assert principal_cache.stats()["misses"] == 2
+
+
+def test_routers_resolve_principal_from_cache(client, user_token, db):
+    from diagnostics import capture_statements
+    import crud
+    import models
+
+    headers = {"Authorization": f"Bearer {user_token}"}
+    client.get("/cart/", headers=headers)      # miss: loads and caches the user
+
+    with capture_statements() as statements:
+        assert client.get("/cart/", headers=headers).status_code == 200
+        assert client.get("/orders/", headers=headers).status_code == 200
+    assert not [s for s in statements if "FROM users" in s]
+
+    # Deactivation drops the cache entry, so routers reject the user at once
+    user = db.query(models.User).filter(models.User.email == "user@example.com").one()
+    crud.set_user_active(db, user, False)
+    assert client.get("/cart/", headers=headers).status_code == 401
+
+
+def test_login_rehashes_outdated_password_hash(client, db):
+    import hashing
+    import models
+    from passlib.context import CryptContext
+
+    weak = CryptContext(schemes=["bcrypt"], bcrypt__default_rounds=4).hash("pass123")
+    db.add(models.User(email="old@b.com", hashed_password=weak))
+    db.commit()
+
+    res = client.post("/token",
+        data={"username": "old@b.com", "password": "pass123"},
+        headers={"Content-Type": "application/x-www-form-urlencoded"}
+    )
+    assert res.status_code == 200
+
+    db.expire_all()
+    upgraded = db.query(models.User).filter(models.User.email == "old@b.com").one().hashed_password
+    assert upgraded != weak
+    assert not hashing.needs_rehash(upgraded)
+
+
+def test_login_rejected_when_hashing_queue_is_full(client, monkeypatch):
+    import hashing
+
+    client.post("/signup", json={"email": "a@b.com", "password": "pass123"})
+    monkeypatch.setattr(hashing.hashing_pool, "queue_limit", 0)
+
+    res = client.post("/token",
+        data={"username": "a@b.com", "password": "pass123"},
+        headers={"Content-Type": "application/x-www-form-urlencoded"}
+    )
+    assert res.status_code == 503
+    assert hashing.hashing_pool.stats()["rejected"] >= 1
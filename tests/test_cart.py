@@ -43,3 +43,100 @@ def test_update_and_remove_cart(client, user_token):
         headers={"Authorization": f"Bearer {user_token}"}
     )
     assert delete.status_code == 200
+
+
+def test_cart_batch_operations(client, user_token):
+    headers = {"Authorization": f"Bearer {user_token}"}
+    ids = [
+        client.post(
+            "/products/",
+            headers=headers,
+            json={"name": name, "description": "x", "price": 10, "stock": 50}
+        ).json()["id"]
+        for name in ("Cable", "Charger", "Case")
+    ]
+    client.post("/cart/", headers=headers, json={"product_id": ids[2], "quantity": 1})
+
+    res = client.post("/cart/batch", headers=headers, json={"operations": [
+        {"op": "add", "product_id": ids[0], "quantity": 2},
+        {"op": "add", "product_id": ids[0], "quantity": 1},
+        {"op": "set", "product_id": ids[1], "quantity": 4},
+        {"op": "remove", "product_id": ids[2]},
+    ]})
+    assert res.status_code == 200
+    assert {i["product_id"]: i["quantity"] for i in res.json()} == {ids[0]: 3, ids[1]: 4}
+
+
+def test_adding_same_product_twice_merges_into_one_line(client, user_token):
+    headers = {"Authorization": f"Bearer {user_token}"}
+    product = client.post(
+        "/products/",
+        headers=headers,
+        json={"name": "Pad", "description": "x", "price": 5, "stock": 50}
+    ).json()
+
+    client.post("/cart/", headers=headers, json={"product_id": product["id"], "quantity": 2})
+    add = client.post("/cart/", headers=headers, json={"product_id": product["id"], "quantity": 3})
+    assert add.json()["quantity"] == 5
+
+    items = client.get("/cart/", headers=headers).json()["items"]
+    assert [(i["product_id"], i["quantity"]) for i in items] == [(product["id"], 5)]
+
+
+def test_cart_batch_folds_operations_on_existing_lines(client, user_token):
+    headers = {"Authorization": f"Bearer {user_token}"}
+    ids = [
+        client.post(
+            "/products/",
+            headers=headers,
+            json={"name": name, "description": "x", "price": 10, "stock": 50}
+        ).json()["id"]
+        for name in ("Cable", "Charger")
+    ]
+    for pid in ids:
+        client.post("/cart/", headers=headers, json={"product_id": pid, "quantity": 2})
+
+    res = client.post("/cart/batch", headers=headers, json={"operations": [
+        {"op": "add", "product_id": ids[0], "quantity": 1},
+        {"op": "remove", "product_id": ids[1]},
+        {"op": "add", "product_id": ids[1], "quantity": 5},
+    ]})
+    assert {i["product_id"]: i["quantity"] for i in res.json()} == {ids[0]: 3, ids[1]: 5}
+
+
+def test_cart_batch_rejects_unknown_products_atomically(client, user_token):
+    headers = {"Authorization": f"Bearer {user_token}"}
+    product = client.post(
+        "/products/",
+        headers=headers,
+        json={"name": "Cable", "description": "x", "price": 10, "stock": 50}
+    ).json()
+
+    res = client.post("/cart/batch", headers=headers, json={"operations": [
+        {"op": "add", "product_id": product["id"], "quantity": 1},
+        {"op": "add", "product_id": 9999, "quantity": 1},
+    ]})
+    assert res.status_code == 404
+    assert client.get("/cart/", headers=headers).json()["items"] == []
+
+
+def test_view_cart_flags_unavailable_products(client, user_token):
+    headers = {"Authorization": f"Bearer {user_token}"}
+    ids = [
+        client.post(
+            "/products/",
+            headers=headers,
+            json={"name": name, "description": "x", "price": price, "stock": 50}
+        ).json()["id"]
+        for name, price in (("Pen", 2), ("Ink", 5), ("Pad", 7))
+    ]
+    for product_id in ids:
+        client.post("/cart/", headers=headers, json={"product_id": product_id, "quantity": 2})
+
+    client.put(f"/products/{ids[1]}/toggle", headers=headers)
+    client.delete(f"/products/{ids[2]}", headers=headers)
+
+    cart = client.get("/cart/", headers=headers).json()
+    assert [i["available"] for i in cart["items"]] == [True, False, False]
+    assert cart["items"][0]["subtotal"] == 4
+    assert cart["total_price"] == 4
@@ -0,0 +1,141 @@
+import io
+import json
+
+import catalog_import
+import models
+from diagnostics import capture_statements
+
+
+def test_import_json_array_upserts_by_id_and_name(db):
+    db.add(models.Product(id=7, name="Old Name", description="x", price=1, stock=1))
+    db.add(models.Product(name="Smart Watch", description="old", price=1, stock=1))
+    db.commit()
+
+    payload = json.dumps([
+        {"id": 7, "name": "Renamed", "description": "by id", "price": 5, "stock": 2},
+        {"name": "Smart Watch", "description": "by name", "price": 89.5, "stock": 40},
+        {"name": "Laptop Stand", "description": "new", "price": 29.99, "stock": 100},
+        {"name": "Broken", "price": "free"},
+        "not an object",
+    ]).encode()
+
+    report = catalog_import.import_products(db, io.BytesIO(payload), batch_size=2)
+
+    assert report["inserted"] == 1
+    assert report["updated"] == 2
+    assert report["failed"] == 2
+    assert [e["row"] for e in report["errors"]] == [4, 5]
+
+    db.expire_all()
+    assert db.get(models.Product, 7).name == "Renamed"
+    watch = db.query(models.Product).filter(models.Product.name == "Smart Watch").one()
+    assert watch.description == "by name"
+    assert db.query(models.Product).count() == 3
+
+
+def test_import_updates_keep_fields_the_record_omits(db):
+    db.add(models.Product(id=3, name="Desk", description="old", price=100, stock=9, is_active=False))
+    db.add(models.Product(name="Lamp", description="old", price=20, stock=4, is_active=True))
+    db.commit()
+
+    payload = json.dumps([
+        {"id": 3, "name": "Desk", "description": "by id", "price": 90},
+        {"name": "Lamp", "description": "by name", "price": 25, "is_active": False},
+        {"name": "Rug", "description": "new", "price": 40},
+    ]).encode()
+    report = catalog_import.import_products(db, io.BytesIO(payload))
+    assert (report["inserted"], report["updated"]) == (1, 2)
+
+    db.expire_all()
+    desk = db.get(models.Product, 3)
+    assert (desk.price, desk.stock, desk.is_active) == (90, 9, False)
+    lamp = db.query(models.Product).filter(models.Product.name == "Lamp").one()
+    assert (lamp.price, lamp.stock, lamp.is_active) == (25, 4, False)
+    rug = db.query(models.Product).filter(models.Product.name == "Rug").one()
+    assert (rug.stock, rug.is_active) == (0, True)
+
+
+def test_import_reports_a_failed_batch_and_keeps_earlier_ones(db, monkeypatch):
+    from sqlalchemy.exc import OperationalError
+    from catalog_cache import catalog_cache
+
+    write_batch = catalog_import._write_batch
+    calls = []
+
+    def locked_on_second_batch(session, batch):
+        calls.append(batch)
+        if len(calls) == 2:
+            session.add(models.Product(name="half written", description="d", price=1))
+            session.flush()
+            raise OperationalError("INSERT INTO products", {}, Exception("database is locked"))
+        return write_batch(session, batch)
+
+    monkeypatch.setattr(catalog_import, "_write_batch", locked_on_second_batch)
+    catalog_cache.put(("list", "stale"), b"[]")
+    records = [{"name": f"Item {i}", "description": "d", "price": 1} for i in range(5)]
+
+    report = catalog_import.import_products(db, io.BytesIO(json.dumps(records).encode()), batch_size=2)
+
+    assert (report["inserted"], report["failed"]) == (3, 2)
+    assert report["errors"] == [
+        {"row": row, "error": "Database error: database is locked"} for row in (3, 4)
+    ]
+    assert catalog_cache.get(("list", "stale")) is None
+    assert db.query(models.Product).filter(models.Product.name == "half written").count() == 0
+
+
+def test_import_ndjson_reports_bad_lines(db):
+    lines = [
+        json.dumps({"name": "A", "description": "a", "price": 1}),
+        "{not json",
+        "",
+        json.dumps({"name": "B", "description": "b", "price": 2}),
+    ]
+    report = catalog_import.import_products(db, io.BytesIO("\n".join(lines).encode()))
+
+    assert report["inserted"] == 2
+    assert report["failed"] == 1
+    assert report["errors"][0]["row"] == 2
+
+
+def test_import_inserts_a_batch_in_one_statement(db):
+    records = [{"name": f"Item {i}", "description": "d", "price": i + 1} for i in range(200)]
+
+    with capture_statements() as statements:
+        report = catalog_import.import_products(db, io.BytesIO(json.dumps(records).encode()), batch_size=200)
+
+    assert report["inserted"] == 200
+    inserts = [s for s in statements if s.lstrip().upper().startswith("INSERT INTO PRODUCTS ")]
+    assert len(inserts) == 1
+    assert db.query(models.Product).count() == 200
+
+
+def test_iter_records_streams_large_array_in_small_reads(monkeypatch):
+    monkeypatch.setattr(catalog_import, "_READ_SIZE", 7)
+    records = [{"name": f"Item {i}", "nested": {"n": [i, i + 1]}} for i in range(50)]
+    stream = io.BytesIO(json.dumps(records, indent=2).encode())
+
+    assert [record for _, record in catalog_import.iter_records(stream)] == records
+
+
+def test_admin_import_endpoint_makes_products_searchable(client):
+    client.post("/signup", json={"email": "admin@example.com", "password": "admin123", "is_admin": True})
+    token = client.post(
+        "/token",
+        data={"username": "admin@example.com", "password": "admin123"},
+        headers={"Content-Type": "application/x-www-form-urlencoded"}
+    ).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    with open("product.json", "rb") as catalog:
+        res = client.post(
+            "/admin/products/import",
+            headers=headers,
+            files={"file": ("product.json", catalog, "application/json")},
+        )
+    assert res.status_code == 200
+    assert res.json()["failed"] == 0
+
+    found = client.get("/products/?search=headphones").json()["items"]
+    assert [p["name"] for p in found] == ["Wireless Headphones"]
+    assert client.get("/admin/stats", headers=headers).json()["total_products"] == res.json()["inserted"]
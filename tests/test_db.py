@@ -17,3 +17,12 @@ def override_get_db():
 # Create tables for test DB
 Base.metadata.drop_all(bind=engine)
 Base.metadata.create_all(bind=engine)
+
+
+def test_engine_factory_applies_sqlite_pragmas():
+    from database import create_db_engine, log_engine_settings
+
+    settings = log_engine_settings(create_db_engine(TEST_DB_URL))
+    assert settings["journal_mode"] == "wal"
+    assert settings["synchronous"] == 1     # NORMAL
+    assert settings["busy_timeout"] == 5000
@@ -0,0 +1,108 @@
+import asyncio
+from datetime import datetime
+
+import jobs
+import models
+
+ADDRESS = {
+    "full_name": "Buyer", "phone": "11111", "street": "Addr", "city": "C",
+    "state": "S", "pincode": "123456", "landmark": None, "country": "India", "is_primary": True
+}
+
+
+def test_order_side_effects_are_queued_then_written(client, user_token, db):
+    headers = {"Authorization": f"Bearer {user_token}"}
+    product = client.post(
+        "/products/",
+        headers=headers,
+        json={"name": "Fan", "description": "x", "price": 25, "stock": 5}
+    ).json()
+    client.post("/addresses/", headers=headers, json=ADDRESS)
+    client.post("/cart/", headers=headers, json={"product_id": product["id"], "quantity": 1})
+
+    order = client.post("/orders/", headers=headers).json()
+    client.post(f"/orders/{order['id']}/pay", headers=headers)
+    client.post(f"/orders/{order['id']}/refund", headers=headers)
+
+    assert client.get(f"/orders/{order['id']}/timeline", headers=headers).json() == []
+    assert db.query(models.Job).count() == 3
+
+    assert jobs.run_pending(db.get_bind()) == 3
+    timeline = client.get(f"/orders/{order['id']}/timeline", headers=headers).json()
+    assert [entry["status"] for entry in timeline] == ["Pending", "Paid", "Refunded"]
+    assert db.query(models.Job).count() == 0
+
+
+def test_jobs_of_one_kind_run_as_a_batch(db, monkeypatch):
+    calls = []
+    monkeypatch.setitem(jobs.HANDLERS, "collect", lambda session, payloads: calls.append(payloads))
+    for n in range(3):
+        jobs.enqueue(db, "collect", {"n": n})
+    db.commit()
+
+    assert jobs.process_batch(db.get_bind()) == 3
+    assert calls == [[{"n": 0}, {"n": 1}, {"n": 2}]]
+
+
+def test_bad_payload_does_not_fail_its_batch(db, monkeypatch):
+    done = []
+
+    def collect(session, payloads):
+        if any(p.get("bad") for p in payloads):
+            raise ValueError("bad payload")
+        done.extend(p["n"] for p in payloads)
+
+    monkeypatch.setitem(jobs.HANDLERS, "collect", collect)
+    for payload in ({"n": 0}, {"n": 1, "bad": True}, {"n": 2}):
+        jobs.enqueue(db, "collect", payload)
+    db.commit()
+
+    assert jobs.process_batch(db.get_bind()) == 3
+    assert done == [0, 2]
+    job = db.query(models.Job).one()
+    assert job.payload["n"] == 1
+    assert (job.status, job.attempts) == ("queued", 1)
+    assert "bad payload" in job.last_error
+
+
+def test_failed_jobs_back_off_then_give_up(db, monkeypatch):
+    def explode(session, payloads):
+        raise RuntimeError("mail server down")
+
+    monkeypatch.setitem(jobs.HANDLERS, "email", explode)
+    monkeypatch.setattr(jobs, "JOB_MAX_ATTEMPTS", 2)
+    jobs.enqueue(db, "email", {"to": "user@example.com"})
+    db.commit()
+
+    assert jobs.process_batch(db.get_bind()) == 1
+    job = db.query(models.Job).one()
+    assert (job.status, job.attempts) == ("queued", 1)
+    assert job.run_at > datetime.now()
+    assert "mail server down" in job.last_error
+    assert jobs.process_batch(db.get_bind()) == 0     # not due yet
+
+    db.query(models.Job).update({"run_at": datetime.now()})
+    db.commit()
+    jobs.process_batch(db.get_bind())
+    db.expire_all()
+    job = db.query(models.Job).one()
+    assert (job.status, job.attempts) == ("failed", 2)
+
+
+def test_workers_drain_queue_on_stop(db, monkeypatch):
+    seen = []
+    monkeypatch.setitem(jobs.HANDLERS, "collect", lambda session, payloads: seen.extend(payloads))
+    bind = db.get_bind()
+
+    async def scenario():
+        pool = jobs.JobWorkers()
+        await pool.start(bind, workers=2)
+        for n in range(5):
+            jobs.enqueue(db, "collect", {"n": n})
+        db.commit()
+        pool.notify()
+        await pool.stop(timeout=5)
+
+    asyncio.run(scenario())
+    assert sorted(p["n"] for p in seen) == [0, 1, 2, 3, 4]
+    assert db.query(models.Job).count() == 0
@@ -0,0 +1,41 @@
+import metrics
+
+
+def test_metrics_endpoint_reports_routes_and_db_statements(client, user_token):
+    metrics.registry.reset()
+    headers = {"Authorization": f"Bearer {user_token}"}
+
+    client.post(
+        "/products/",
+        headers=headers,
+        json={"name": "Globe", "description": "Desk", "price": 30, "stock": 3}
+    )
+    client.get("/products/?limit=5")
+    client.get("/products/9999")
+
+    body = client.get("/metrics").text
+
+    assert 'http_requests_total{method="GET",route="/products/",status="200"} 1' in body
+    assert 'http_requests_total{method="GET",route="/products/{product_id}",status="404"} 1' in body
+    assert 'http_request_duration_seconds_count{method="POST",route="/products/"} 1' in body
+    # the async catalog read is attributed too: 2 statements (products + images)
+    assert 'db_statements_per_request_sum{method="GET",route="/products/"} 2' in body
+    assert "http_requests_in_flight 1" in body      # the /metrics request itself
+
+
+def test_failed_statement_does_not_leave_a_timing_entry(db):
+    import pytest
+    from sqlalchemy import text
+    from sqlalchemy.exc import OperationalError
+
+    import query_timing
+
+    stats = metrics.begin_request()
+    for _ in range(3):
+        with pytest.raises(OperationalError):
+            db.execute(text("SELECT * FROM no_such_table"))
+        db.rollback()
+    db.execute(text("SELECT 1"))
+
+    assert db.connection().info.get(query_timing._STACK_KEY) == []
+    assert stats.statements == 1
@@ -36,3 +36,117 @@ def test_create_order(client, user_token):
         headers={"Authorization": f"Bearer {user_token}"}
     )
     assert response.status_code == 200
+
+
+def test_create_order_insufficient_stock_rolls_back(client, user_token):
+    headers = {"Authorization": f"Bearer {user_token}"}
+
+    in_stock = client.post(
+        "/products/",
+        headers=headers,
+        json={"name": "Pen", "description": "Blue", "price": 2, "stock": 10}
+    ).json()
+    scarce = client.post(
+        "/products/",
+        headers=headers,
+        json={"name": "Lamp", "description": "Desk", "price": 30, "stock": 1}
+    ).json()
+
+    client.post(
+        "/addresses/",
+        headers=headers,
+        json={
+            "full_name": "Buyer",
+            "phone": "11111",
+            "street": "Addr",
+            "city": "C",
+            "state": "S",
+            "pincode": "123456",
+            "landmark": None,
+            "country": "India",
+            "is_primary": True
+        }
+    )
+
+    client.post("/cart/", headers=headers, json={"product_id": in_stock["id"], "quantity": 3})
+    client.post("/cart/", headers=headers, json={"product_id": scarce["id"], "quantity": 1})
+
+    # Stock is written down after the lamp was carted
+    client.put(
+        f"/products/{scarce['id']}",
+        headers=headers,
+        json={"name": "Lamp", "description": "Desk", "price": 30, "stock": 0}
+    )
+
+    response = client.post("/orders/", headers=headers)
+    assert response.status_code == 400
+
+    # Nothing from the failed checkout is kept
+    assert client.get(f"/products/{in_stock['id']}").json()["stock"] == 10
+    assert len(client.get("/cart/", headers=headers).json()["items"]) == 2
+
+
+def test_create_order_decrements_stock(client, user_token):
+    headers = {"Authorization": f"Bearer {user_token}"}
+
+    product = client.post(
+        "/products/",
+        headers=headers,
+        json={"name": "Cup", "description": "Ceramic", "price": 5, "stock": 10}
+    ).json()
+
+    client.post(
+        "/addresses/",
+        headers=headers,
+        json={
+            "full_name": "Buyer",
+            "phone": "11111",
+            "street": "Addr",
+            "city": "C",
+            "state": "S",
+            "pincode": "123456",
+            "landmark": None,
+            "country": "India",
+            "is_primary": True
+        }
+    )
+    client.post("/cart/", headers=headers, json={"product_id": product["id"], "quantity": 4})
+
+    order = client.post("/orders/", headers=headers).json()
+    assert order["total_amount"] == 20
+    assert order["items"][0]["quantity"] == 4
+    assert client.get(f"/products/{product['id']}").json()["stock"] == 6
+    assert client.get("/cart/", headers=headers).json()["items"] == []
+
+
+def place_order(client, headers, name="Mug", quantity=2):
+    product = client.post(
+        "/products/",
+        headers=headers,
+        json={"name": name, "description": "x", "price": 5, "stock": 10}
+    ).json()
+    client.post("/cart/", headers=headers, json={"product_id": product["id"], "quantity": quantity})
+    return client.post("/orders/", headers=headers).json()
+
+
+def test_order_summary_view_and_sparse_fields(client, user_token):
+    headers = {"Authorization": f"Bearer {user_token}"}
+    client.post("/addresses/", headers=headers, json={
+        "full_name": "Buyer", "phone": "11111", "street": "Addr", "city": "C",
+        "state": "S", "pincode": "123456", "landmark": None, "country": "India", "is_primary": True
+    })
+    order = place_order(client, headers)
+
+    summary = client.get("/orders/?view=summary", headers=headers).json()["items"]
+    assert len(summary) == 1
+    assert summary[0]["id"] == order["id"]
+    assert summary[0]["item_count"] == 1
+    assert set(summary[0]) == {"id", "status", "total_amount", "created_at", "item_count"}
+
+    sparse = client.get("/orders/?fields=status,total_amount", headers=headers).json()["items"]
+    assert sparse == [{"id": order["id"], "status": "Pending", "total_amount": 10}]
+
+    single = client.get(f"/orders/{order['id']}?fields=items", headers=headers).json()
+    assert single == {"id": order["id"], "items": order["items"]}
+
+    assert client.get("/orders/?fields=nope", headers=headers).status_code == 400
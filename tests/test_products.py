@@ -1,3 +1,6 @@
+import pytest
+
+
 def test_create_and_list_products(client, user_token):
     res = client.post(
         "/products/",
@@ -12,7 +15,7 @@ def test_create_and_list_products(client, user_token):
     assert res.status_code == 200
 
     res2 = client.get("/products/")
-    assert len(res2.json()) == 1
+    assert len(res2.json()["items"]) == 1
 
 
 def test_get_single_product(client, user_token):
@@ -32,3 +35,289 @@ def test_get_single_product(client, user_token):
     res = client.get(f"/products/{product['id']}")
     assert res.status_code == 200
     assert res.json()["name"] == "Phone"
+
+
+def test_search_products_by_prefix_and_description(client, user_token):
+    headers = {"Authorization": f"Bearer {user_token}"}
+    for name, description, price in [
+        ("Wireless Headphones", "Noise-cancelling Bluetooth headphones", 150),
+        ("Wired Earbuds", "Budget earbuds", 20),
+        ("Laptop Stand", "Aluminum stand for headphones and laptops", 30),
+    ]:
+        client.post(
+            "/products/",
+            headers=headers,
+            json={"name": name, "description": description, "price": price, "stock": 5}
+        )
+
+    res = client.get("/products/?search=headph")
+    assert {p["name"] for p in res.json()["items"]} == {"Wireless Headphones", "Laptop Stand"}
+
+    res = client.get("/products/?search=headph&max_price=100")
+    assert [p["name"] for p in res.json()["items"]] == ["Laptop Stand"]
+
+    res = client.get("/products/?search=bluetooth")
+    assert [p["name"] for p in res.json()["items"]] == ["Wireless Headphones"]
+
+
+def test_search_index_follows_updates_and_deletes(client, user_token):
+    headers = {"Authorization": f"Bearer {user_token}"}
+    product = client.post(
+        "/products/",
+        headers=headers,
+        json={"name": "Desk Lamp", "description": "LED", "price": 25, "stock": 5}
+    ).json()
+
+    client.put(
+        f"/products/{product['id']}",
+        headers=headers,
+        json={"name": "Floor Lamp", "description": "Halogen", "price": 25, "stock": 5}
+    )
+    assert client.get("/products/?search=desk").json()["items"] == []
+    assert len(client.get("/products/?search=halogen").json()["items"]) == 1
+
+    client.delete(f"/products/{product['id']}", headers=headers)
+    assert client.get("/products/?search=lamp").json()["items"] == []
+
+
+def test_list_products_cursor_pagination(client, user_token):
+    headers = {"Authorization": f"Bearer {user_token}"}
+    for i in range(5):
+        client.post(
+            "/products/",
+            headers=headers,
+            json={"name": f"Item {i}", "description": "Bulk", "price": 10 - i, "stock": 1}
+        )
+
+    seen = []
+    cursor = None
+    while True:
+        url = "/products/?limit=2&sort=price"
+        if cursor:
+            url += f"&cursor={cursor}"
+        body = client.get(url).json()
+        assert body["total"] is None
+        seen += [p["price"] for p in body["items"]]
+        cursor = body["next_cursor"]
+        if cursor is None:
+            break
+
+    assert seen == [6, 7, 8, 9, 10]
+    assert client.get("/products/?include_total=true").json()["total"] == 5
+    assert client.get("/products/?cursor=not-a-cursor").status_code == 400
+
+
+def test_search_results_paginate_by_rank(client, user_token):
+    headers = {"Authorization": f"Bearer {user_token}"}
+    for i in range(3):
+        client.post(
+            "/products/",
+            headers=headers,
+            json={"name": f"Cable {i}", "description": "USB", "price": 5, "stock": 1}
+        )
+
+    first = client.get("/products/?search=cable&limit=2").json()
+    assert len(first["items"]) == 2
+    second = client.get(f"/products/?search=cable&limit=2&cursor={first['next_cursor']}").json()
+    assert second["next_cursor"] is None
+
+    ids = [p["id"] for p in first["items"] + second["items"]]
+    assert len(set(ids)) == 3
+
+
+def _admin_headers(client):
+    client.post("/signup", json={"email": "admin@example.com", "password": "admin123", "is_admin": True})
+    token = client.post(
+        "/token",
+        data={"username": "admin@example.com", "password": "admin123"},
+        headers={"Content-Type": "application/x-www-form-urlencoded"}
+    ).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+def test_upload_images_deduplicates_by_content(client, tmp_path, monkeypatch):
+    import products
+    monkeypatch.setattr(products, "UPLOAD_FOLDER", str(tmp_path))
+    headers = _admin_headers(client)
+
+    product = client.post(
+        "/products/",
+        headers=headers,
+        json={"name": "Camera", "description": "DSLR", "price": 700, "stock": 2}
+    ).json()
+
+    res = client.post(
+        f"/products/{product['id']}/images",
+        headers=headers,
+        files=[
+            ("files", ("a.jpg", b"same-bytes", "image/jpeg")),
+            ("files", ("b.jpg", b"same-bytes", "image/jpeg")),
+            ("files", ("c.jpg", b"other-bytes", "image/jpeg")),
+        ],
+    )
+    assert res.status_code == 200
+    assert len(res.json()["images"]) == 2
+    assert len(list(tmp_path.iterdir())) == 2
+
+
+def test_upload_images_enforces_size_limit(client, tmp_path, monkeypatch):
+    import products
+    monkeypatch.setattr(products, "UPLOAD_FOLDER", str(tmp_path))
+    monkeypatch.setattr(products, "MAX_IMAGE_BYTES", 8)
+    headers = _admin_headers(client)
+
+    product = client.post(
+        "/products/",
+        headers=headers,
+        json={"name": "Tripod", "description": "Steel", "price": 40, "stock": 2}
+    ).json()
+
+    res = client.post(
+        f"/products/{product['id']}/images",
+        headers=headers,
+        files=[
+            ("files", ("ok.jpg", b"small", "image/jpeg")),
+            ("files", ("big.jpg", b"far-too-large", "image/jpeg")),
+        ],
+    )
+    assert res.status_code == 413
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_render_variants_writes_each_size(tmp_path):
+    Image = pytest.importorskip("PIL.Image")
+    import thumbnails
+
+    source = tmp_path / "abc123.jpg"
+    Image.new("RGB", (2000, 1000), "red").save(source)
+
+    variants = thumbnails.render_variants(str(source), str(tmp_path / "variants"))
+
+    assert set(variants) == set(thumbnails.VARIANT_SIZES)
+    with Image.open(tmp_path / "variants" / variants["thumb"]) as thumb:
+        assert max(thumb.size) == thumbnails.VARIANT_SIZES["thumb"]
+
+
+def test_upload_images_records_variants(client, tmp_path, monkeypatch):
+    Image = pytest.importorskip("PIL.Image")
+    import io
+    import time
+    import products
+    import thumbnails
+    monkeypatch.setattr(products, "UPLOAD_FOLDER", str(tmp_path))
+    headers = _admin_headers(client)
+
+    product = client.post(
+        "/products/",
+        headers=headers,
+        json={"name": "Poster", "description": "Print", "price": 15, "stock": 3}
+    ).json()
+
+    buffer = io.BytesIO()
+    Image.new("RGB", (800, 600), "blue").save(buffer, "JPEG")
+    res = client.post(
+        f"/products/{product['id']}/images",
+        headers=headers,
+        files=[("files", ("poster.jpg", buffer.getvalue(), "image/jpeg"))],
+    )
+    assert res.status_code == 200
+
+    try:
+        deadline = time.monotonic() + 60
+        variants = None
+        while variants is None and time.monotonic() < deadline:
+            time.sleep(0.2)
+            variants = client.get(f"/products/{product['id']}").json()["images"][0]["variants"]
+    finally:
+        thumbnails.shutdown()
+
+    assert set(variants) == {"thumb", "card", "detail"}
+    assert variants["thumb"].startswith("/uploads/products/variants/")
+
+
+def test_product_etag_and_conditional_get(client, user_token):
+    headers = {"Authorization": f"Bearer {user_token}"}
+    product = client.post(
+        "/products/",
+        headers=headers,
+        json={"name": "Mug", "description": "Tea", "price": 8, "stock": 4}
+    ).json()
+
+    first = client.get(f"/products/{product['id']}")
+    etag = first.headers["etag"]
+    assert first.json()["name"] == "Mug"
+
+    not_modified = client.get(f"/products/{product['id']}", headers={"If-None-Match": etag})
+    assert not_modified.status_code == 304
+
+    listing = client.get("/products/")
+    assert client.get("/products/", headers={"If-None-Match": listing.headers["etag"]}).status_code == 304
+
+    client.put(
+        f"/products/{product['id']}",
+        headers=headers,
+        json={"name": "Big Mug", "description": "Tea", "price": 9, "stock": 4}
+    )
+    changed = client.get(f"/products/{product['id']}", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.json()["name"] == "Big Mug"
+    assert client.get("/products/").json()["items"][0]["name"] == "Big Mug"
+
+
+def test_cache_fill_does_not_overwrite_newer_invalidation(client, db, user_token, monkeypatch):
+    import async_crud
+    import crud
+    import schemas
+    from catalog_cache import catalog_cache
+
+    product = client.post(
+        "/products/",
+        headers={"Authorization": f"Bearer {user_token}"},
+        json={"name": "Teapot", "description": "Clay", "price": 30, "stock": 2}
+    ).json()
+
+    fetch = async_crud.get_product
+
+    async def fetch_then_concurrent_update(*args, **kwargs):
+        stale = await fetch(*args, **kwargs)
+        # another request updates the product after our read, before our put()
+        crud.update_product(db, product["id"], schemas.ProductCreate(
+            name="Glass Teapot", description="Clay", price=30, stock=2
+        ))
+        catalog_cache.invalidate_product(product["id"])
+        return stale
+
+    monkeypatch.setattr(async_crud, "get_product", fetch_then_concurrent_update)
+    assert client.get(f"/products/{product['id']}").json()["name"] == "Teapot"
+    monkeypatch.setattr(async_crud, "get_product", fetch)
+
+    assert client.get(f"/products/{product['id']}").json()["name"] == "Glass Teapot"
+
+
+def test_product_sparse_fieldsets(client, user_token):
+    headers = {"Authorization": f"Bearer {user_token}"}
+    product = client.post(
+        "/products/",
+        headers=headers,
+        json={"name": "Kettle", "description": "Steel", "price": 40, "stock": 5}
+    ).json()
+
+    listed = client.get("/products/?fields=name,price").json()["items"]
+    assert listed == [{"id": product["id"], "name": "Kettle", "price": 40}]
+
+    single = client.get(f"/products/{product['id']}?fields=stock").json()
+    assert single == {"id": product["id"], "stock": 5}
+    assert "images" in client.get(f"/products/{product['id']}").json()
+
+    assert client.get("/products/?fields=secret").status_code == 400
+
+
+def test_response_schemas_read_orm_objects():
+    import models
+    import schemas
+
+    product = models.Product(id=1, name="Lamp", description="LED", price=20, stock=2, is_active=True)
+    product.images = [models.ProductImage(id=5, variants={"thumb": "/t.webp"})]
+
+    out = schemas.Product.model_validate(product)
+    assert out.images[0].variants == {"thumb": "/t.webp"}
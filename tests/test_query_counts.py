@@ -0,0 +1,127 @@
+from diagnostics import capture_statements, query_budget
+import models
+from catalog_cache import catalog_cache
+
+
+def seed_products(db, count):
+    for i in range(count):
+        product = models.Product(name=f"P{i}", description="d", price=1 + i, stock=3)
+        product.images = [
+            models.ProductImage(file_path=f"/uploads/products/{i}-a.jpg"),
+            models.ProductImage(file_path=f"/uploads/products/{i}-b.jpg"),
+        ]
+        db.add(product)
+    db.commit()
+
+
+def seed_orders(db, email, count):
+    user = db.query(models.User).filter(models.User.email == email).first()
+    product = models.Product(name="Seed", description="d", price=5, stock=0)
+    db.add(product)
+    db.flush()
+    for i in range(count):
+        order = models.Order(
+            user_id=user.id, total_amount=10, shipping_name="n", shipping_phone="p",
+            shipping_address="a", shipping_city="c", shipping_state="s", shipping_pincode="1",
+        )
+        order.items = [models.OrderItem(product_id=product.id, quantity=1, price=5) for _ in range(2)]
+        db.add(order)
+    db.commit()
+
+
+def test_list_products_query_count_is_constant(client, db):
+    seed_products(db, 2)
+    with capture_statements() as few:
+        assert len(client.get("/products/?limit=50").json()["items"]) == 2
+
+    seed_products(db, 8)
+    catalog_cache.clear()   # seeded behind the API's back
+    with capture_statements() as many:
+        assert len(client.get("/products/?limit=50").json()["items"]) == 10
+
+    assert len(few) == len(many) == 2    # products + selectin images
+
+
+def test_list_orders_query_count_is_constant(client, db, user_token):
+    headers = {"Authorization": f"Bearer {user_token}"}
+
+    seed_orders(db, "user@example.com", 2)
+    client.get("/me", headers=headers)     # principal is cached from here on
+    with capture_statements() as few:
+        assert len(client.get("/orders/?limit=50", headers=headers).json()["items"]) == 2
+
+    seed_orders(db, "user@example.com", 8)
+    with capture_statements() as many:
+        assert len(client.get("/orders/?limit=50", headers=headers).json()["items"]) == 10
+
+    assert len(few) == len(many)
+
+
+def test_order_summary_is_one_aggregate_query(client, db, user_token):
+    headers = {"Authorization": f"Bearer {user_token}"}
+    seed_orders(db, "user@example.com", 5)
+    client.get("/me", headers=headers)     # principal is cached from here on
+
+    # just the aggregate; no order_items load
+    with query_budget(1):
+        summary = client.get("/orders/?view=summary", headers=headers).json()["items"]
+    assert [o["item_count"] for o in summary] == [2] * 5
+
+
+def test_admin_orders_query_count_is_constant(client, db):
+    client.post("/signup", json={"email": "admin@example.com", "password": "admin123", "is_admin": True})
+    token = client.post(
+        "/token",
+        data={"username": "admin@example.com", "password": "admin123"},
+        headers={"Content-Type": "application/x-www-form-urlencoded"}
+    ).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    seed_orders(db, "admin@example.com", 2)
+    client.get("/me", headers=headers)     # principal is cached from here on
+    with capture_statements() as few:
+        assert len(client.get("/admin/orders", headers=headers).json()["items"]) == 2
+
+    seed_orders(db, "admin@example.com", 8)
+    with capture_statements() as many:
+        assert len(client.get("/admin/orders", headers=headers).json()["items"]) == 10
+
+    assert len(few) == len(many)
+
+
+def test_view_cart_fits_query_budget(client, db, user_token):
+    headers = {"Authorization": f"Bearer {user_token}"}
+    seed_products(db, 6)
+    for product in db.query(models.Product):
+        client.post("/cart/", headers=headers, json={"product_id": product.id, "quantity": 1})
+
+    # the principal is cached by the adds above: only the cart join runs
+    with query_budget(1):
+        assert len(client.get("/cart/", headers=headers).json()["items"]) == 6
+
+
+def test_n_plus_one_detector_flags_repeated_shapes(caplog, monkeypatch):
+    import diagnostics
+    monkeypatch.setattr(diagnostics, "N_PLUS_ONE_THRESHOLD", 3)
+
+    diagnostics.begin_request()
+    shapes = diagnostics._shapes.get()
+    for _ in range(4):
+        shapes[diagnostics.statement_shape("SELECT * FROM products WHERE id IN (?, ?)")] += 1
+    shapes[diagnostics.statement_shape("SELECT *  FROM products WHERE id IN (?, ?, ?)")] += 1
+
+    repeated = diagnostics.end_request("GET /demo")
+    assert repeated == [("SELECT * FROM products WHERE id IN (?)", 5)]
+    assert "Possible N+1 in GET /demo" in caplog.text
+
+
+def test_slow_query_log_includes_params_and_plan(client, db, caplog, monkeypatch):
+    import diagnostics
+    monkeypatch.setattr(diagnostics, "SLOW_QUERY_MS", 0)
+    monkeypatch.setattr(diagnostics, "EXPLAIN_SLOW_QUERIES", True)
+
+    db.query(models.Product).filter(models.Product.price > 5).all()
+
+    assert "Slow query" in caplog.text
+    assert "params=(5" in caplog.text
+    assert "plan=[" in caplog.text
@@ -0,0 +1,138 @@
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+
+import models
+import reservations
+
+
+def second_shopper(client):
+    client.post("/signup", json={"email": "other@example.com", "password": "password123"})
+    token = client.post(
+        "/token",
+        data={"username": "other@example.com", "password": "password123"},
+        headers={"Content-Type": "application/x-www-form-urlencoded"}
+    ).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+def create_product(client, headers, stock):
+    return client.post(
+        "/products/",
+        headers=headers,
+        json={"name": "Last One", "description": "x", "price": 10, "stock": stock}
+    ).json()["id"]
+
+
+def test_carted_units_are_held_from_other_shoppers(client, user_token):
+    headers = {"Authorization": f"Bearer {user_token}"}
+    other = second_shopper(client)
+    product_id = create_product(client, headers, stock=1)
+
+    assert client.post("/cart/", headers=headers, json={"product_id": product_id, "quantity": 1}).status_code == 200
+    blocked = client.post("/cart/", headers=other, json={"product_id": product_id, "quantity": 1})
+    assert blocked.status_code == 400
+    assert client.get("/cart/", headers=other).json()["items"] == []
+
+    client.delete(f"/cart/{product_id}", headers=headers)
+    assert client.post("/cart/", headers=other, json={"product_id": product_id, "quantity": 1}).status_code == 200
+
+
+def test_holds_follow_cart_quantity_and_checkout_consumes_them(client, user_token, db):
+    headers = {"Authorization": f"Bearer {user_token}"}
+    product_id = create_product(client, headers, stock=5)
+    client.post("/addresses/", headers=headers, json={
+        "full_name": "Buyer", "phone": "11111", "street": "Addr", "city": "C",
+        "state": "S", "pincode": "123456", "landmark": None, "country": "India", "is_primary": True
+    })
+
+    client.post("/cart/", headers=headers, json={"product_id": product_id, "quantity": 2})
+    client.put(f"/cart/{product_id}?quantity=4", headers=headers)
+    assert db.get(models.Product, product_id).reserved == 4
+
+    assert client.post("/orders/", headers=headers).status_code == 200
+    db.expire_all()
+    product = db.get(models.Product, product_id)
+    assert (product.stock, product.reserved) == (1, 0)
+    assert db.query(models.Reservation).count() == 0
+
+
+def test_sweeper_releases_expired_holds_in_batches(client, user_token, db):
+    headers = {"Authorization": f"Bearer {user_token}"}
+    ids = [create_product(client, headers, stock=3) for _ in range(3)]
+    client.post("/cart/batch", headers=headers, json={"operations": [
+        {"op": "add", "product_id": pid, "quantity": 2} for pid in ids
+    ]})
+    assert [db.get(models.Product, pid).reserved for pid in ids] == [2, 2, 2]
+
+    db.query(models.Reservation).filter(models.Reservation.product_id != ids[2]).update(
+        {"expires_at": datetime.now() - timedelta(minutes=1)}
+    )
+    db.commit()
+
+    assert reservations.sweep_expired(db.get_bind(), batch_size=1) == 2
+    db.expire_all()
+    assert [db.get(models.Product, pid).reserved for pid in ids] == [0, 0, 2]
+    assert db.query(models.Reservation).count() == 1
+
+
+def test_holders_compete_for_stock_written_down_below_holds(client, user_token, db):
+    headers = {"Authorization": f"Bearer {user_token}"}
+    other = second_shopper(client)
+    product_id = create_product(client, headers, stock=4)
+    for shopper in (headers, other):
+        client.post("/addresses/", headers=shopper, json={
+            "full_name": "Buyer", "phone": "11111", "street": "Addr", "city": "C",
+            "state": "S", "pincode": "123456", "landmark": None, "country": "India", "is_primary": True
+        })
+        client.post("/cart/", headers=shopper, json={"product_id": product_id, "quantity": 2})
+
+    client.put(
+        f"/products/{product_id}",
+        headers=headers,
+        json={"name": "Last One", "description": "x", "price": 10, "stock": 3}
+    )
+
+    assert client.post("/orders/", headers=headers).status_code == 200
+    assert client.post("/orders/", headers=other).status_code == 400
+    db.expire_all()
+    product = db.get(models.Product, product_id)
+    assert (product.stock, product.reserved) == (1, 2)
+
+
+def test_negative_quantities_cannot_corrupt_reservations(client, user_token, db):
+    headers = {"Authorization": f"Bearer {user_token}"}
+    other = second_shopper(client)
+    product_id = create_product(client, headers, stock=5)
+
+    client.post("/cart/", headers=headers, json={"product_id": product_id, "quantity": 3})
+    assert client.put(f"/cart/{product_id}?quantity=-5", headers=headers).status_code == 422
+    assert client.post("/cart/", headers=other, json={"product_id": product_id, "quantity": -4}).status_code == 422
+    assert client.post("/cart/", headers=other, json={"product_id": product_id, "quantity": 10}).status_code == 400
+
+    db.expire_all()
+    product = db.get(models.Product, product_id)
+    assert (product.stock, product.reserved) == (5, 3)
+
+    # Setting the line to 0 removes it and hands the units back
+    assert client.put(f"/cart/{product_id}?quantity=0", headers=headers).status_code == 200
+    assert client.get("/cart/", headers=headers).json()["items"] == []
+    db.expire_all()
+    assert db.get(models.Product, product_id).reserved == 0
+
+
+def test_hold_rejects_negative_quantities_and_caps_releases(client, user_token, db):
+    headers = {"Authorization": f"Bearer {user_token}"}
+    product_id = create_product(client, headers, stock=5)
+    user_id = db.query(models.User.id).filter(models.User.email == "user@example.com").scalar()
+
+    with pytest.raises(HTTPException):
+        reservations.hold(db, user_id, {product_id: -2})
+    db.rollback()
+
+    reservations.hold(db, user_id, {product_id: 2})
+    reservations.hold(db, user_id, {product_id: 0})
+    db.commit()
+    product = db.get(models.Product, product_id)
+    assert product.reserved == 0 and product.stock >= 0
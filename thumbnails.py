@@ -0,0 +1,119 @@
+"""
+Resized derivatives (variants) of product images.
+
+After upload_images commits, each new image is rendered in a process pool
+into a fixed set of sizes under uploads/products/variants. The finished
+variant URLs are then written to ProductImage.variants. Pillow is
+optional: without it, images are served as uploaded and `variants`
+stays empty.
+"""
+import importlib.util
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from sqlalchemy.orm import Session
+
+import models
+from catalog_cache import catalog_cache
+
+logger = logging.getLogger(__name__)
+
+# longest edge in pixels
+VARIANT_SIZES = {"thumb": 160, "card": 480, "detail": 1200}
+VARIANT_FORMAT = os.getenv("IMAGE_VARIANT_FORMAT", "WEBP").upper()    # WEBP or JPEG
+VARIANT_QUALITY = int(os.getenv("IMAGE_VARIANT_QUALITY", "82"))
+THUMBNAIL_WORKERS = int(os.getenv("THUMBNAIL_WORKERS", "2"))
+
+PILLOW_AVAILABLE = importlib.util.find_spec("PIL") is not None
+
+_executor = None
+
+
+def render_variants(source_path: str, dest_dir: str) -> dict:
+    """
+    Write every size in VARIANT_SIZES for one image and return {variant: file name}.
+
+    Runs inside a pool worker. Images are stored under their content hash
+    (see products.upload_images), so variants that already exist are reused.
+    """
+    from PIL import Image, ImageOps
+
+    stem = os.path.splitext(os.path.basename(source_path))[0]
+    ext = "webp" if VARIANT_FORMAT == "WEBP" else "jpg"
+    os.makedirs(dest_dir, exist_ok=True)
+
+    variants = {}
+    with Image.open(source_path) as original:
+        image = ImageOps.exif_transpose(original)
+        if VARIANT_FORMAT == "JPEG" and image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+
+        for name, edge in VARIANT_SIZES.items():
+            file_name = f"{stem}_{name}.{ext}"
+            target = os.path.join(dest_dir, file_name)
+            if not os.path.exists(target):
+                resized = image.copy()
+                resized.thumbnail((edge, edge))
+                resized.save(target, VARIANT_FORMAT, quality=VARIANT_QUALITY)
+            variants[name] = file_name
+    return variants
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        # spawn, not fork: the API process is multi-threaded
+        _executor = ProcessPoolExecutor(
+            max_workers=THUMBNAIL_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _executor
+
+
+def _save_variants(bind, image_id: int, product_id: int, url_prefix: str, future):
+    try:
+        variants = future.result()
+    except Exception:
+        logger.exception("Could not render variants for product image %s", image_id)
+        return
+
+    urls = {name: f"{url_prefix}/{file_name}" for name, file_name in variants.items()}
+    with Session(bind) as db:
+        db.query(models.ProductImage).filter(models.ProductImage.id == image_id).update(
+            {"variants": urls}
+        )
+        db.commit()
+    catalog_cache.invalidate_product(product_id, membership_changed=False)
+
+
+def schedule(bind, product_id: int, images, upload_folder: str, url_prefix: str = "/uploads/products"):
+    """
+    Queue variant rendering for committed ProductImage rows.
+
+    `images` is a list of (image id, file name under upload_folder) for
+    `product_id`; `bind` is the engine the results are written back with.
+    Returns the futures.
+    """
+    if not PILLOW_AVAILABLE:
+        logger.warning("Pillow is not installed; skipping image variants")
+        return []
+
+    dest_dir = os.path.join(upload_folder, "variants")
+    futures = []
+    for image_id, file_name in images:
+        future = _get_executor().submit(
+            render_variants, os.path.join(upload_folder, file_name), dest_dir
+        )
+        future.add_done_callback(partial(_save_variants, bind, image_id, product_id, f"{url_prefix}/variants"))
+        futures.append(future)
+    return futures
+
+
+def shutdown():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None